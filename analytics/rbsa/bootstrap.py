@@ -0,0 +1,187 @@
+"""
+Moving-block bootstrap for RBSA weights.
+
+Resamples (y, X) rows in contiguous blocks (preserving short-range serial
+dependence), optionally reruns a selection step on every replicate, refits
+the simplex NNLS from Gram statistics warm-started at the full-sample
+weights, and summarises selection frequencies and weight percentile bands.
+Replicates are spread over a process pool; the return panel is placed in
+shared memory once so workers never receive copies of X.
+
+A selector dict describes the selection step, at the penalty levels chosen
+on the full sample (no CV inside replicates):
+{"engine": "elasticnet", "l1_ratios": [...], "alphas": [...], "threshold": m}
+runs the standardised elastic-net path per l1_ratio down to its chosen alpha
+(alphas[i], a decreasing grid), keeps the assets nonzero for at least m
+ratios, then fits simplex NNLS on the kept assets.
+"""
+from __future__ import annotations
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Any, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import enet_path
+from optimization import nnls_simplex_gram
+
+# Worker-side view of the shared [X | y] panel, set by _attach_shared()
+_SHARED: Dict[str, Any] = {}
+
+
+def moving_block_indices(n_obs: int, block_len: int, n_replicates: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Row indices for moving-block bootstrap replicates.
+
+    Args:
+        n_obs: Sample length T
+        block_len: Block length in periods (clipped to [1, T])
+        n_replicates: Number of replicates
+        rng: Random generator
+
+    Returns:
+        Integer array (n_replicates x T); each row concatenates randomly
+        started blocks of consecutive periods, truncated to T
+    """
+    block_len = int(min(max(block_len, 1), n_obs))
+    n_blocks = -(-n_obs // block_len)
+    starts = rng.integers(0, n_obs - block_len + 1, size=(n_replicates, n_blocks))
+    idx = starts[:, :, None] + np.arange(block_len)
+    return idx.reshape(n_replicates, -1)[:, :n_obs]
+
+
+def _attach_shared(name: str, shape: tuple) -> None:
+    """Pool initializer: map the shared [X | y] panel into this worker."""
+    shm = shared_memory.SharedMemory(name=name)
+    _SHARED["shm"] = shm  # keep the mapping alive for the worker's lifetime
+    _SHARED["data"] = np.ndarray(shape, dtype=float, buffer=shm.buf)
+
+
+def _enet_support(Xb: np.ndarray, yb: np.ndarray, selector: Dict[str, Any]) -> np.ndarray:
+    """Majority vote of the elastic-net supports at the chosen alphas, on standardised data."""
+    scale = Xb.std(axis=0)
+    scale[scale == 0] = 1.0
+    Xc = np.asfortranarray((Xb - Xb.mean(axis=0)) / scale)
+    yc = yb - yb.mean()
+    gram, xy = Xc.T @ Xc, Xc.T @ yc
+    votes = np.zeros(Xb.shape[1], dtype=int)
+    for l1, alphas in zip(selector["l1_ratios"], selector["alphas"]):
+        _, coefs, _ = enet_path(Xc, yc, l1_ratio=l1, alphas=alphas, precompute=gram, Xy=xy,
+                                copy_X=False, check_input=False, max_iter=selector.get("max_iter", 10000))
+        votes += np.abs(coefs[:, -1]) > 1e-10
+    keep = votes >= selector["threshold"]
+    if not keep.any():
+        keep[int(np.argmax(np.abs(coefs[:, -1])))] = True
+    return keep
+
+
+def _fit_replicates(idx: np.ndarray, sum_to_one: bool, w0: np.ndarray, selector: Optional[Dict[str, Any]] = None,
+                    select_tol: float = 1e-6, data: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Weights and selection indicators for each row of resampling indices (runs in a worker).
+
+    Without a selector an asset is selected when its simplex NNLS weight exceeds select_tol.
+    """
+    data = _SHARED["data"] if data is None else data
+    k = data.shape[1] - 1
+    W, S = np.zeros((len(idx), k)), np.zeros((len(idx), k), dtype=bool)
+    for r, rows in enumerate(idx):
+        D = data[rows]
+        Xb, yb = D[:, :-1], D[:, -1]
+        G, c = Xb.T @ Xb, Xb.T @ yb
+        if selector is None:
+            W[r] = nnls_simplex_gram(G, c, sum_to_one=sum_to_one, w0=w0)
+            S[r] = W[r] > select_tol
+        else:
+            keep = _enet_support(Xb, yb, selector)
+            sub = np.flatnonzero(keep)
+            W[r, sub] = nnls_simplex_gram(G[np.ix_(sub, sub)], c[sub], sum_to_one=sum_to_one, w0=w0[sub])
+            S[r] = keep
+    return W, S
+
+
+def block_bootstrap_weights(
+    X: pd.DataFrame,
+    y: pd.Series,
+    n_replicates: int = 200,
+    block_len: int = 12,
+    sum_to_one: bool = True,
+    w0: Optional[np.ndarray] = None,
+    n_jobs: Optional[int] = 1,
+    seed: int = 0,
+    percentiles: Sequence[float] = (5, 50, 95),
+    select_tol: float = 1e-6,
+    selector: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Moving-block bootstrap of simplex NNLS weights, optionally with selection.
+
+    Each replicate resamples the aligned (y, X) rows in blocks of `block_len`
+    periods. Without a selector it re-solves the constrained regression on
+    all columns, and an asset counts as selected when its weight exceeds
+    `select_tol` (the simplex constraint itself zeroes out redundant assets).
+    With a selector (see the module docstring) the selection step is rerun on
+    all columns of X first, and selection_freq is the share of replicates
+    whose selection includes the asset.
+
+    Args:
+        X: Candidate asset returns (T x k)
+        y: Fund returns (T,)
+        n_replicates: Number of bootstrap replicates
+        block_len: Block length in periods
+        sum_to_one: Impose the budget constraint
+        w0: Full-sample weights used as the warm start (fitted if None)
+        n_jobs: Worker processes (1 = run in-process; None = all cores, in a process pool
+            with the data in shared memory, started for this call)
+        seed: Seed for the resampling indices (results do not depend on n_jobs)
+        percentiles: Percentiles for the weight bands
+        select_tol: Weight above which an asset counts as selected
+        selector: Selection step rerun per replicate (None = NNLS support only)
+
+    Returns:
+        Dict with:
+            - weights: DataFrame of replicate weights (n_replicates x k)
+            - selection_freq: Series, share of replicates selecting each asset
+            - weight_bands: DataFrame (assets x 'p{q}' percentile columns)
+            - full_sample_weights: Series, the warm-start weights
+            - n_replicates, block_len
+    """
+    data = np.column_stack([X.values, y.values]).astype(float)
+    n_obs, k = X.shape
+
+    if w0 is None:
+        w0 = nnls_simplex_gram(X.values.T @ X.values, X.values.T @ y.values, sum_to_one=sum_to_one)
+
+    idx = moving_block_indices(n_obs, block_len, n_replicates, np.random.default_rng(seed))
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, n_replicates)
+    if n_jobs <= 1:
+        W, S = _fit_replicates(idx, sum_to_one, w0, selector, select_tol, data=data)
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=data.nbytes)
+        try:
+            np.ndarray(data.shape, dtype=float, buffer=shm.buf)[:] = data
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_attach_shared,
+                                     initargs=(shm.name, data.shape)) as pool:
+                chunks = np.array_split(idx, n_jobs)
+                parts = list(pool.map(_fit_replicates, chunks, [sum_to_one] * n_jobs, [w0] * n_jobs,
+                                      [selector] * n_jobs, [select_tol] * n_jobs))
+                W, S = np.vstack([p[0] for p in parts]), np.vstack([p[1] for p in parts])
+        finally:
+            shm.close()
+            shm.unlink()
+
+    weights = pd.DataFrame(W, columns=X.columns)
+    bands = pd.DataFrame(
+        np.percentile(W, percentiles, axis=0).T,
+        index=X.columns,
+        columns=[f"p{q:g}" for q in percentiles]
+    )
+    return {
+        "weights": weights,
+        "selection_freq": pd.Series(S.mean(axis=0), index=X.columns),
+        "weight_bands": bands,
+        "full_sample_weights": pd.Series(w0, index=X.columns),
+        "n_replicates": n_replicates,
+        "block_len": block_len
+    }
@@ -0,0 +1,189 @@
+"""
+Time-series cross-validation with reusable fold statistics.
+
+Splits never shuffle: test sets are contiguous blocks of periods.
+
+- blocked: K contiguous test blocks, trained on everything else
+- purged: blocked, with `purge` periods on each side of the test block removed
+  from training, so that autocorrelated neighbours do not leak into the fit
+- expanding: walk-forward; each test block is trained only on earlier periods
+
+TimeSeriesFolds computes each fold's train and test moments (X'X, X'y, y'y and
+column sums) once. Any stage that fits linear or simplex-constrained models per
+fold (Approach A scoring, Approach B lambda selection, composite out-of-sample
+metrics) works from these k x k statistics, and column subsets are sliced out
+rather than recomputed.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Any, List, Tuple, Optional, Sequence
+import numpy as np
+import pandas as pd
+from optimization import nnls_simplex_gram
+
+CV_SCHEMES = ("blocked", "purged", "expanding")
+
+Split = Tuple[np.ndarray, np.ndarray]
+
+
+def blocked_splits(n_obs: int, n_splits: int = 5) -> List[Split]:
+    """Contiguous test blocks (as unshuffled KFold), trained on all other periods."""
+    return purged_splits(n_obs, n_splits, purge=0)
+
+
+def purged_splits(n_obs: int, n_splits: int = 5, purge: int = 0) -> List[Split]:
+    """
+    Blocked splits with `purge` periods dropped from training on both sides of each test block.
+    """
+    if not 2 <= n_splits <= n_obs:
+        raise ValueError(f"n_splits must be in [2, {n_obs}], got {n_splits}")
+    sizes = np.full(n_splits, n_obs // n_splits)
+    sizes[:n_obs % n_splits] += 1
+    bounds = np.concatenate([[0], np.cumsum(sizes)])
+    idx = np.arange(n_obs)
+    splits = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        train = idx[(idx < start - purge) | (idx >= stop + purge)]
+        splits.append((train, idx[start:stop]))
+    return splits
+
+
+def expanding_splits(n_obs: int, n_splits: int = 5, min_train: int = 60, purge: int = 0) -> List[Split]:
+    """
+    Walk-forward splits: periods after the first `min_train` are cut into
+    `n_splits` contiguous test blocks, each trained on all periods before it
+    (less `purge` periods immediately preceding the block).
+    """
+    if min_train + n_splits > n_obs:
+        raise ValueError(f"Need more than min_train + n_splits = {min_train + n_splits} observations, got {n_obs}")
+    idx = np.arange(n_obs)
+    tail = purged_splits(n_obs - min_train, n_splits)
+    return [(idx[:min_train + test[0] - purge], test + min_train) for _, test in tail]
+
+
+def make_splits(n_obs: int, cv_cfg: Optional[Dict[str, Any]] = None) -> List[Split]:
+    """
+    Splits from the config `cv` section (scheme, n_splits, purge_months, min_train_months).
+    """
+    cv_cfg = cv_cfg or {}
+    scheme = cv_cfg.get("scheme", "blocked")
+    n_splits = cv_cfg.get("n_splits", 5)
+    purge = cv_cfg.get("purge_months", 0)
+    if scheme == "blocked":
+        return blocked_splits(n_obs, n_splits)
+    if scheme == "purged":
+        return purged_splits(n_obs, n_splits, purge)
+    if scheme == "expanding":
+        return expanding_splits(n_obs, n_splits, cv_cfg.get("min_train_months", 60), purge)
+    raise ValueError(f"Unknown cv.scheme '{scheme}' (expected one of {CV_SCHEMES})")
+
+
+@dataclass
+class FoldMoments:
+    """Sufficient statistics of one sample block: n, X'X, X'y, y'y, ΣX and Σy."""
+    n: int
+    xx: np.ndarray
+    xy: np.ndarray
+    yy: float
+    sx: np.ndarray
+    sy: float
+
+    @classmethod
+    def from_arrays(cls, X: np.ndarray, y: np.ndarray) -> "FoldMoments":
+        return cls(n=len(y), xx=X.T @ X, xy=X.T @ y, yy=float(y @ y), sx=X.sum(axis=0), sy=float(y.sum()))
+
+    def take(self, idx: np.ndarray) -> "FoldMoments":
+        """Moments restricted to the columns `idx`."""
+        return FoldMoments(self.n, self.xx[np.ix_(idx, idx)], self.xy[idx], self.yy, self.sx[idx], self.sy)
+
+    def centered(self, scale: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(X'X, X'y) of the block after demeaning, optionally with columns divided by `scale`."""
+        xx = self.xx - np.outer(self.sx, self.sx) / self.n
+        xy = self.xy - self.sx * self.sy / self.n
+        if scale is not None:
+            xx = xx / np.outer(scale, scale)
+            xy = xy / scale
+        return xx, xy
+
+    def sse(self, W: np.ndarray) -> np.ndarray:
+        """Σ (y - X w)² for each row w of W (k,) or (m x k), from the moments alone."""
+        W = np.atleast_2d(W)
+        return self.yy - 2 * W @ self.xy + np.einsum("mi,ij,mj->m", W, self.xx, W)
+
+
+@dataclass
+class Fold:
+    train: np.ndarray
+    test: np.ndarray
+    train_moments: FoldMoments
+    test_moments: FoldMoments
+
+
+@dataclass
+class TimeSeriesFolds:
+    """
+    Time-series CV splits with per-fold train/test moments computed once.
+
+    Memory is O(n_folds x k²); slice column subsets with subset() instead of
+    rebuilding.
+
+    Example:
+        >>> folds = TimeSeriesFolds.from_data(X, y, make_splits(len(y), cfg.get("cv")))
+        >>> folds.cv_rmse(["IWF", "IWD", "EFA"])
+    """
+    columns: pd.Index
+    folds: List[Fold]
+
+    @classmethod
+    def from_data(cls, X: pd.DataFrame, y: pd.Series, splits: Sequence[Split]) -> "TimeSeriesFolds":
+        Xv, yv = X.values.astype(float), y.values.astype(float)
+        folds = [
+            Fold(train, test, FoldMoments.from_arrays(Xv[train], yv[train]), FoldMoments.from_arrays(Xv[test], yv[test]))
+            for train, test in splits
+        ]
+        return cls(columns=X.columns, folds=folds)
+
+    @classmethod
+    def from_config(cls, X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any]) -> "TimeSeriesFolds":
+        return cls.from_data(X, y, make_splits(len(y), cfg.get("cv")))
+
+    @property
+    def splits(self) -> List[Split]:
+        return [(f.train, f.test) for f in self.folds]
+
+    def subset(self, cols: Sequence[str]) -> "TimeSeriesFolds":
+        """Folds restricted to `cols` (moments are sliced, not recomputed)."""
+        idx = self.columns.get_indexer(list(cols))
+        if (idx < 0).any():
+            missing = [c for c, i in zip(cols, idx) if i < 0]
+            raise KeyError(f"Columns not in folds: {missing}")
+        return TimeSeriesFolds(
+            columns=self.columns[idx],
+            folds=[Fold(f.train, f.test, f.train_moments.take(idx), f.test_moments.take(idx)) for f in self.folds]
+        )
+
+    def cv_mse(self, cols: Sequence[str], sum_to_one: bool = True) -> np.ndarray:
+        """
+        Per-fold test MSE of the simplex NNLS fit on `cols`, trained on each fold's moments.
+        """
+        idx = self.columns.get_indexer(list(cols))
+        out = np.empty(len(self.folds))
+        for i, f in enumerate(self.folds):
+            tr, te = f.train_moments.take(idx), f.test_moments.take(idx)
+            w = nnls_simplex_gram(tr.xx, tr.xy, sum_to_one=sum_to_one)
+            out[i] = te.sse(w)[0] / te.n
+        return out
+
+    def cv_rmse(self, cols: Sequence[str], sum_to_one: bool = True) -> float:
+        """Pooled out-of-sample RMSE of the simplex NNLS fit on `cols`."""
+        n_test = np.array([f.test_moments.n for f in self.folds])
+        return float(np.sqrt(np.sum(self.cv_mse(cols, sum_to_one) * n_test) / n_test.sum()))
+
+
+def folds_for(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], folds: Optional[TimeSeriesFolds] = None) -> TimeSeriesFolds:
+    """Reuse `folds` (sliced to X's columns) when given, else build them from the config `cv` section."""
+    if folds is None:
+        return TimeSeriesFolds.from_config(X, y, cfg)
+    if list(folds.columns) != list(X.columns):
+        return folds.subset(X.columns)
+    return folds
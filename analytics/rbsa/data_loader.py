@@ -3,6 +3,8 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Tuple, Optional
 import yfinance as yf
+from holdings import HoldingsMatrix
+from frequency import TemporalAggregation, FUND_FREQUENCIES, infer_months_per_period
 
 def load_fund_returns(csv_path: str) -> pd.DataFrame:
     df = pd.read_csv(csv_path, parse_dates=["date"])
@@ -10,13 +12,20 @@ def load_fund_returns(csv_path: str) -> pd.DataFrame:
     return df
 
 def load_portfolio(csv_path: str) -> pd.DataFrame:
-    """Load portfolio with ticker and weight columns."""
+    """
+    Load portfolio with ticker and weight columns.
+
+    An optional 'date' column marks dated holdings snapshots (one row per
+    date and ticker); without it the weights are treated as static.
+    """
     df = pd.read_csv(csv_path)
     # Clean up column names (remove spaces)
     df.columns = df.columns.str.strip()
     # Clean up ticker and weight values
     df['ticker'] = df['ticker'].str.strip()
     df['wt'] = pd.to_numeric(df['wt'].astype(str).str.strip())
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'].astype(str).str.strip())
     return df
 
 def download_prices(tickers, start: str, end: Optional[str] = None) -> pd.DataFrame:
@@ -46,6 +55,48 @@ def align_and_merge(fund_df: pd.DataFrame, index_rets: pd.DataFrame, rf_series:
         rf = rf_series.reindex(common_idx)
     return fund["fund_return"], X, rf
 
+def align_mixed_frequency(
+    fund_df: pd.DataFrame,
+    index_rets: pd.DataFrame,
+    rf_series: pd.Series | None,
+    fund_frequency: str = "auto",
+    method: str = "compound"
+) -> Tuple[pd.Series, pd.DataFrame, pd.Series | None, Optional[TemporalAggregation]]:
+    """
+    Align a fund that may report less often than monthly with monthly index returns.
+
+    Index (and risk-free) returns are aggregated over each reporting period
+    with a TemporalAggregation instead of being sampled at the report dates.
+    Monthly funds fall back to align_and_merge().
+
+    Args:
+        fund_df: Fund returns with 'date' and 'fund_return' columns
+        index_rets: Monthly index returns
+        rf_series: Monthly risk-free returns, or None
+        fund_frequency: "auto" (inferred from the report dates) or a key of FUND_FREQUENCIES
+        method: "compound" or "sum"
+
+    Returns:
+        (fund returns, aggregated index returns, aggregated risk-free returns,
+        the aggregation, or None for a monthly fund)
+    """
+    fund = fund_df.set_index("date").sort_index()["fund_return"].dropna()
+    if fund_frequency == "auto":
+        k = infer_months_per_period(fund.index)
+    elif fund_frequency in FUND_FREQUENCIES:
+        k = FUND_FREQUENCIES[fund_frequency]
+    else:
+        raise ValueError(f"Unknown fund_frequency '{fund_frequency}' (expected 'auto' or one of {list(FUND_FREQUENCIES)})")
+    if k == 1:
+        return align_and_merge(fund_df, index_rets, rf_series) + (None,)
+
+    agg = TemporalAggregation.from_dates(index_rets.index, fund.index, k, method=method)
+    fund.index = fund.index.to_period("M")
+    y = fund.groupby(level=0).last().reindex(agg.period_index.to_period("M"))
+    y.index = agg.period_index
+    rf = agg.apply(rf_series) if rf_series is not None else None
+    return y, agg.apply(index_rets), rf, agg
+
 def compute_excess(returns: pd.DataFrame, rf: pd.Series | None) -> pd.DataFrame:
     if rf is None:
         return returns
@@ -56,7 +107,8 @@ def compute_portfolio_returns(portfolio_df: pd.DataFrame, start: str, end: Optio
     Download prices for portfolio tickers and compute weighted monthly returns.
 
     Args:
-        portfolio_df: DataFrame with 'ticker' and 'wt' columns
+        portfolio_df: DataFrame with 'ticker' and 'wt' columns, plus an optional
+            'date' column for time-varying holdings (see HoldingsMatrix)
         start: Start date for price download
         end: End date for price download
         freq: Frequency for resampling (default 'ME' for month-end)
@@ -64,6 +116,12 @@ def compute_portfolio_returns(portfolio_df: pd.DataFrame, start: str, end: Optio
     Returns:
         Series of portfolio weighted returns indexed by date
     """
+    if 'date' in portfolio_df.columns:
+        holdings = HoldingsMatrix.from_frame(portfolio_df)
+        prices = download_prices(holdings.tickers, start, end)
+        returns = to_monthly_returns(prices, freq)
+        return holdings.portfolio_returns(returns)
+
     tickers = portfolio_df['ticker'].tolist()
     weights = portfolio_df['wt'].values
 
@@ -0,0 +1,117 @@
+"""
+Holdings engine for portfolios with dated, time-varying weights.
+
+Holdings snapshots (date, ticker, wt) are stored as a sparse
+snapshot x ticker matrix. Weights are forward-filled between rebalances by
+row-gathering the sparse matrix onto the return dates, and portfolio returns
+come from one sparse-dense product with the asset return panel, so large
+portfolios (thousands of names, hundreds of rebalances) never densify the
+weight matrix.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import List
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+@dataclass
+class HoldingsMatrix:
+    """Sparse date x ticker holdings weights.
+
+    Attributes:
+        weights: CSR matrix (n_snapshots x n_tickers), each row sums to 1
+        snapshot_dates: Sorted rebalance dates, one per row of `weights`
+        tickers: Column labels of `weights`
+
+    Example:
+        >>> hm = HoldingsMatrix.from_frame(holdings_df)
+        >>> port_rets = hm.portfolio_returns(monthly_returns)
+    """
+    weights: sparse.csr_matrix
+    snapshot_dates: pd.DatetimeIndex
+    tickers: List[str]
+
+    @classmethod
+    def from_frame(cls, holdings: pd.DataFrame) -> "HoldingsMatrix":
+        """Build from a long DataFrame with 'date', 'ticker' and 'wt' columns.
+
+        Duplicate (date, ticker) rows are summed and each snapshot is
+        normalized to sum to 1.
+
+        Raises:
+            ValueError: If required columns are missing or a snapshot has zero total weight
+        """
+        missing = {"date", "ticker", "wt"} - set(holdings.columns)
+        if missing:
+            raise ValueError(f"Holdings missing required columns: {sorted(missing)}")
+
+        df = holdings[holdings["wt"] != 0]
+        date_codes, snapshot_dates = pd.factorize(pd.to_datetime(df["date"]), sort=True)
+        ticker_codes, tickers = pd.factorize(df["ticker"], sort=True)
+
+        W = sparse.coo_matrix(
+            (df["wt"].to_numpy(dtype=float), (date_codes, ticker_codes)),
+            shape=(len(snapshot_dates), len(tickers))
+        ).tocsr()  # sums duplicates
+
+        row_sums = np.asarray(W.sum(axis=1)).ravel()
+        if np.any(row_sums == 0):
+            bad = [str(d.date()) for d in snapshot_dates[row_sums == 0]]
+            raise ValueError(f"Holdings snapshots with zero total weight: {bad}")
+        off = ~np.isclose(row_sums, 1.0, atol=1e-6)
+        if off.any():
+            print(f"Warning: {off.sum()} holdings snapshots do not sum to 1.0. Normalizing...")
+        W = sparse.diags(1.0 / row_sums) @ W
+
+        return cls(weights=W.tocsr(), snapshot_dates=pd.DatetimeIndex(snapshot_dates), tickers=list(tickers))
+
+    def snapshot_index(self, dates: pd.DatetimeIndex) -> np.ndarray:
+        """Row of `weights` in force for each return period (-1 if none).
+
+        A snapshot dated d applies to periods ending strictly after d: month-end
+        holdings earn the following month's return.
+        """
+        return np.searchsorted(self.snapshot_dates.values, pd.DatetimeIndex(dates).values, side="left") - 1
+
+    def weights_at(self, dates: pd.DatetimeIndex) -> sparse.csr_matrix:
+        """Forward-filled weights on `dates` (len(dates) x n_tickers, sparse).
+
+        Rows for periods before the first snapshot are empty.
+        """
+        idx = self.snapshot_index(dates)
+        covered = idx >= 0
+        W = self.weights[np.where(covered, idx, 0)]
+        if not covered.all():
+            W = sparse.diags(covered.astype(float)) @ W
+        return W.tocsr()
+
+    def portfolio_returns(self, returns: pd.DataFrame) -> pd.Series:
+        """
+        Weighted portfolio returns on the index of `returns`.
+
+        Tickers without return data in a period have their weight redistributed
+        pro rata over the remaining holdings of that period. Periods before the
+        first snapshot, or with no covered holdings, are dropped.
+
+        Args:
+            returns: Asset returns (dates x tickers)
+
+        Returns:
+            Series of portfolio returns indexed by date
+        """
+        missing = [t for t in self.tickers if t not in returns.columns]
+        if missing:
+            preview = missing[:10] + (["..."] if len(missing) > 10 else [])
+            print(f"Warning: Missing data for {len(missing)} tickers: {preview}")
+
+        R = returns.reindex(columns=self.tickers).to_numpy(dtype=float)
+        available = ~np.isnan(R)
+        W = self.weights_at(returns.index)
+
+        gross = np.asarray(W.multiply(np.where(available, R, 0.0)).sum(axis=1)).ravel()
+        covered = np.asarray(W.multiply(available).sum(axis=1)).ravel()
+
+        keep = covered > 0
+        return pd.Series(gross[keep] / covered[keep], index=returns.index[keep])
@@ -0,0 +1,203 @@
+"""
+Lagged-regressor (Dimson) RBSA for stale-priced funds.
+
+Instead of de-smoothing the fund, each asset enters with its contemporaneous
+return and lags 1..L, and the asset's style weight is the sum of its lag
+coefficients (Dimson, 1979):
+
+    y_t = Σ_i Σ_l b_il x_i,t-l + e_t,       w_i = Σ_l b_il
+
+All lag coefficients are non-negative and, under the budget constraint, sum to
+one, so the summed weights lie on the simplex like an ordinary RBSA fit.
+Fits cover periods L..T-1 (the first L periods only supply lags).
+
+The lag-expanded design is never materialised. Its Gram matrix consists of
+(L+1)² N x N blocks Σ_t x_t-l x_t-m', and all blocks with the same lag
+difference d = m - l are the same shifted cross-product Σ_t x_t x_t-d' with
+the window moved back l periods. Each is therefore one N x N product plus
+l added and l dropped outer products at the window edges, O(T N² (L+1))
+instead of O(T N² (L+1)²). The same assembly gives the moments of any block
+of periods, so CV fold statistics come from it too. Selection works on
+assets: a subset's expanded columns are all lags of its assets.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from functools import cached_property
+from typing import List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from optimization import nnls_simplex_gram
+from cv import FoldMoments, Fold, Split, TimeSeriesFolds, make_splits
+
+
+def lagged_block_moments(X: np.ndarray, y: np.ndarray, n_lags: int, start: int, stop: int) -> FoldMoments:
+    """
+    Moments of the lag-expanded design over periods start..stop-1.
+
+    Args:
+        X: Asset returns (T x N)
+        y: Fund returns (T,)
+        n_lags: Number of lags L; columns are ordered asset-major, (asset i, lag l) at i*(L+1) + l
+        start, stop: Period range, n_lags <= start < stop <= T
+
+    Returns:
+        FoldMoments with N*(L+1) columns
+    """
+    T, N = X.shape
+    p = n_lags + 1
+    if not n_lags <= start < stop <= T:
+        raise ValueError(f"Period range [{start}, {stop}) must lie within [{n_lags}, {T}]")
+    blocks = np.empty((p, p, N, N))
+    for d in range(p):
+        # Block (0, d), then (l, l+d) by moving the window back one period at a time
+        B = X[start:stop].T @ X[start - d:stop - d]
+        for l in range(p - d):
+            if l:
+                B = B + np.outer(X[start - l], X[start - l - d]) - np.outer(X[stop - l], X[stop - l - d])
+            blocks[l, l + d] = B
+            blocks[l + d, l] = B.T
+    lagged = [X[start - l:stop - l] for l in range(p)]
+    ys = y[start:stop]
+    return FoldMoments(
+        n=stop - start,
+        xx=blocks.transpose(2, 0, 3, 1).reshape(N * p, N * p),
+        xy=np.stack([Xl.T @ ys for Xl in lagged], axis=1).ravel(),
+        yy=float(ys @ ys),
+        sx=np.stack([Xl.sum(axis=0) for Xl in lagged], axis=1).ravel(),
+        sy=float(ys.sum())
+    )
+
+
+def sum_lags(frame: pd.DataFrame) -> pd.DataFrame:
+    """Sum (asset, lag) columns per asset, e.g. lag coefficients to Dimson weights."""
+    return frame.T.groupby(level="asset", sort=False).sum().T
+
+
+def _add_moments(a: FoldMoments, b: FoldMoments) -> FoldMoments:
+    return FoldMoments(a.n + b.n, a.xx + b.xx, a.xy + b.xy, a.yy + b.yy, a.sx + b.sx, a.sy + b.sy)
+
+
+@dataclass
+class LaggedDesign:
+    """
+    Lag-expanded design of (X, y) with cached Gram moments and CV fold moments.
+
+    Has the fit() interface of UniverseStats (asset-level weights, summed over
+    lags), so selection code can work on asset names.
+
+    Example:
+        >>> design = LaggedDesign(X, y, n_lags=2)
+        >>> design.fit(["IWF", "IWD", "AGG"])        # Dimson weights per asset
+        >>> design.cv_rmse(["IWF", "IWD", "AGG"])
+    """
+    X: pd.DataFrame
+    y: pd.Series
+    n_lags: int
+    splits: Optional[List[Split]] = None
+
+    def __post_init__(self):
+        if self.n_lags < 0 or self.n_lags >= len(self.y) - 1:
+            raise ValueError(f"n_lags must be in [0, {len(self.y) - 2}], got {self.n_lags}")
+
+    @property
+    def columns(self) -> pd.Index:
+        return self.X.columns
+
+    @cached_property
+    def lag_columns(self) -> pd.MultiIndex:
+        """(asset, lag) labels of the expanded columns."""
+        return pd.MultiIndex.from_product([self.X.columns, range(self.n_lags + 1)], names=["asset", "lag"])
+
+    @cached_property
+    def y_aligned(self) -> pd.Series:
+        """Fund returns over the fitted periods (the first n_lags periods dropped)."""
+        return self.y.iloc[self.n_lags:]
+
+    @cached_property
+    def _values(self):
+        return self.X.values.astype(float), self.y.values.astype(float)
+
+    def block_moments(self, rows: np.ndarray) -> FoldMoments:
+        """Moments over fitted-period positions `rows` (0 = period n_lags), one assembly per contiguous run."""
+        rows = np.asarray(rows)
+        Xv, yv = self._values
+        breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+        out = None
+        for run in np.split(rows, breaks):
+            m = lagged_block_moments(Xv, yv, self.n_lags, run[0] + self.n_lags, run[-1] + 1 + self.n_lags)
+            out = m if out is None else _add_moments(out, m)
+        return out
+
+    @cached_property
+    def moments(self) -> FoldMoments:
+        """Full-sample moments of the expanded design."""
+        Xv, yv = self._values
+        return lagged_block_moments(Xv, yv, self.n_lags, self.n_lags, len(yv))
+
+    @cached_property
+    def folds(self) -> TimeSeriesFolds:
+        """CV folds over the fitted periods (default make_splits()), with (asset, lag) columns."""
+        splits = self.splits if self.splits is not None else make_splits(len(self.y_aligned))
+        return TimeSeriesFolds(
+            columns=self.lag_columns,
+            folds=[Fold(tr, te, self.block_moments(tr), self.block_moments(te)) for tr, te in splits]
+        )
+
+    def precompute(self, folds: bool = False) -> "LaggedDesign":
+        """Assemble the full-sample moments (and the CV fold moments when `folds`) now, e.g. before slicing with subset()."""
+        self.moments
+        if folds:
+            self.folds
+        return self
+
+    def expanded_index(self, cols: Sequence[str]) -> np.ndarray:
+        """Positions of all lags of `cols` among the expanded columns."""
+        idx = self.X.columns.get_indexer(list(cols))
+        if (idx < 0).any():
+            raise KeyError(f"Columns not in design: {[c for c, i in zip(cols, idx) if i < 0]}")
+        p = self.n_lags + 1
+        return (idx[:, None] * p + np.arange(p)).ravel()
+
+    def fit_lags(self, cols: Sequence[str], sum_to_one: bool = True, w0: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Non-negative lag coefficients of `cols` (k x L+1), summing to one overall when sum_to_one.
+
+        w0 is an optional warm start of the same shape.
+        """
+        m = self.moments.take(self.expanded_index(cols))
+        b = nnls_simplex_gram(m.xx, m.xy, sum_to_one=sum_to_one, w0=None if w0 is None else np.ravel(w0))
+        return b.reshape(len(cols), self.n_lags + 1)
+
+    def fit(self, cols: Sequence[str], sum_to_one: bool = True, w0: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dimson weights of `cols`: lag coefficients summed per asset (w0 warm-starts the lag coefficients)."""
+        return self.fit_lags(cols, sum_to_one=sum_to_one, w0=w0).sum(axis=1)
+
+    def predict(self, cols: Sequence[str], B: np.ndarray) -> np.ndarray:
+        """Fitted values over the fitted periods for lag coefficients B (k x L+1)."""
+        Xv = self.X[list(cols)].values.astype(float)
+        T = len(Xv)
+        return sum(Xv[self.n_lags - l:T - l] @ B[:, l] for l in range(self.n_lags + 1))
+
+    def lagged_frame(self, cols: Sequence[str]) -> pd.DataFrame:
+        """The expanded design of `cols` over the fitted periods (for small subsets only)."""
+        Xv = self.X[list(cols)].values.astype(float)
+        T = len(Xv)
+        Z = np.stack([Xv[self.n_lags - l:T - l] for l in range(self.n_lags + 1)], axis=2)
+        return pd.DataFrame(Z.reshape(len(Z), -1), index=self.y_aligned.index,
+                            columns=pd.MultiIndex.from_product([list(cols), range(self.n_lags + 1)], names=["asset", "lag"]))
+
+    def cv_rmse(self, cols: Sequence[str], sum_to_one: bool = True) -> float:
+        """Pooled out-of-sample RMSE of the lagged fit on the assets `cols`."""
+        return self.folds.cv_rmse(list(self.lag_columns[self.expanded_index(cols)]), sum_to_one=sum_to_one)
+
+    def subset(self, cols: Sequence[str]) -> "LaggedDesign":
+        """Design of X[cols]; already computed moments and folds are sliced, not recomputed."""
+        cols = list(cols)
+        eidx = self.expanded_index(cols)
+        sub = LaggedDesign(self.X[cols], self.y, self.n_lags, self.splits)
+        cached = self.__dict__
+        if "moments" in cached:
+            sub.moments = cached["moments"].take(eidx)
+        if "folds" in cached:
+            sub.folds = cached["folds"].subset(list(self.lag_columns[eidx]))
+        return sub
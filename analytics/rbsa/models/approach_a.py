@@ -1,11 +1,18 @@
 from __future__ import annotations
+import copy
 import numpy as np
 import pandas as pd
-from typing import Dict, Any, List, Tuple
-from rbsa_utils import rolling_origin_splits, hac_se, model_diagnostics
+from typing import Dict, Any, List, Tuple, Optional
+from rbsa_utils import rolling_origin_splits, hac_se, model_diagnostics, model_diagnostics_batch
 from optimization import nnls_simplex
+from cv import TimeSeriesFolds, folds_for, make_splits
+from universe import UniverseStats, stats_for
+from lagged import LaggedDesign
+from rolling import ewm_weights, EWMState
 
-def stepwise_nnls(X: pd.DataFrame, y: pd.Series, max_k: int, sum_to_one: bool, eps_rmse: float, mode: str = "in_sample") -> List[str]:
+def stepwise_nnls(X: pd.DataFrame, y: pd.Series, max_k: int, sum_to_one: bool, eps_rmse: float, mode: str = "in_sample",
+                  folds: Optional[TimeSeriesFolds] = None, stats: Optional[UniverseStats] = None,
+                  design: Optional[LaggedDesign] = None) -> List[str]:
     candidates = list(X.columns)
     chosen = []
     best_metric = np.inf if mode == "prediction" else -np.inf  # RMSE (lower better) vs R² (higher better)
@@ -15,22 +22,40 @@ def stepwise_nnls(X: pd.DataFrame, y: pd.Series, max_k: int, sum_to_one: bool, e
         return chosen
 
     while len(chosen) < max_k and len(candidates) > 0:
-        trial_scores = []
-        for c in candidates:
-            cols = chosen + [c]
-            w = nnls_simplex(X[cols].values, y.values, sum_to_one=sum_to_one)
-            resid = y.values - X[cols].values.dot(w)
-
-            if mode == "in_sample":
-                # Use R² (higher is better)
-                ss_res = np.sum(resid**2)
-                ss_tot = np.sum((y.values - y.values.mean())**2)
-                metric = 1 - (ss_res / ss_tot) if ss_tot > 0 else 0.0
+        if mode == "prediction" and (folds is not None or design is not None):
+            # Out-of-sample RMSE from the precomputed fold moments (lower is better);
+            # a lagged design scores each asset with all of its lags
+            cv = design if design is not None else folds
+            if design is None and stats is not None and not stats.plain_least_squares:
+                # Robust or weighted fits need the observations, not just the fold moments
+                metric = [stats.cv_rmse(chosen + [c], folds.splits, sum_to_one=sum_to_one) for c in candidates]
             else:
-                # Use RMSE (lower is better)
-                metric = np.sqrt(np.mean(resid**2))
+                metric = [cv.cv_rmse(chosen + [c], sum_to_one=sum_to_one) for c in candidates]
+        else:
+            y_fit = design.y_aligned if design is not None else y
+            Yhat = np.empty((len(y_fit), len(candidates)))
+            for j, c in enumerate(candidates):
+                cols = chosen + [c]
+                if design is not None:
+                    Yhat[:, j] = design.predict(cols, design.fit_lags(cols, sum_to_one=sum_to_one))
+                    continue
+                if stats is not None:
+                    w = stats.fit(cols, sum_to_one=sum_to_one)
+                else:
+                    w = nnls_simplex(X[cols].values, y.values, sum_to_one=sum_to_one)
+                Yhat[:, j] = X[cols].values.dot(w)
 
-            trial_scores.append((metric, c))
+            # Score all trial models together: R² (higher is better) or RMSE (lower is better)
+            if design is None and stats is not None and stats.obs_weights is not None:
+                # Weighted fits are scored with the same observation weights
+                om, yv = stats.obs_weights, y_fit.values
+                wsse = om @ (yv[:, None] - Yhat) ** 2
+                sst = om @ (yv - om @ yv / om.sum()) ** 2
+                metric = (1 - wsse / sst if mode == "in_sample" else np.sqrt(wsse / om.sum())).tolist()
+            else:
+                diag = model_diagnostics_batch(y_fit, Yhat, k=len(chosen) + 1)
+                metric = (diag["r2"] if mode == "in_sample" else diag["rmse"]).tolist()
+        trial_scores = list(zip(metric, candidates))
 
         trial_scores.sort(reverse=(mode == "in_sample"))  # descending for R², ascending for RMSE
 
@@ -61,7 +86,11 @@ def stepwise_nnls(X: pd.DataFrame, y: pd.Series, max_k: int, sum_to_one: bool, e
 
     return chosen
 
-def fit_one(X: pd.DataFrame, y: pd.Series, cols: List[str], sum_to_one: bool) -> Dict[str, Any]:
+def fit_one(X: pd.DataFrame, y: pd.Series, cols: List[str], sum_to_one: bool, hac_lags: int = 6,
+            stats: Optional[UniverseStats] = None, design: Optional[LaggedDesign] = None,
+            w0: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    if design is not None and len(cols) > 0:
+        return fit_one_lagged(design, cols, sum_to_one, hac_lags=hac_lags, w0=w0)
     if len(cols) == 0:
         # Return empty result if no columns selected
         return {
@@ -71,10 +100,17 @@ def fit_one(X: pd.DataFrame, y: pd.Series, cols: List[str], sum_to_one: bool) ->
             "hac_se": np.array([])
         }
 
-    w = nnls_simplex(X[cols].values, y.values, sum_to_one=sum_to_one)
+    if stats is not None:
+        w = stats.fit(cols, sum_to_one=sum_to_one, w0=w0)
+    else:
+        w = nnls_simplex(X[cols].values, y.values, sum_to_one=sum_to_one)
+    return _weights_result(X, y, cols, w, sum_to_one, hac_lags)
+
+def _weights_result(X: pd.DataFrame, y: pd.Series, cols: List[str], w: np.ndarray, sum_to_one: bool,
+                    hac_lags: int) -> Dict[str, Any]:
     yhat = X[cols].values.dot(w)
     resid = y.values - yhat
-    se = hac_se(X[cols].values, resid)
+    se = hac_se(X[cols].values, resid, lag=hac_lags, weights=w, sum_to_one=sum_to_one)
     return {
         "weights": pd.Series(w, index=cols),
         "residuals": pd.Series(resid, index=y.index),
@@ -82,14 +118,122 @@ def fit_one(X: pd.DataFrame, y: pd.Series, cols: List[str], sum_to_one: bool) ->
         "hac_se": se
     }
 
-def approach_A_pipeline(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any]) -> Dict[str, Any]:
+def fit_one_lagged(design: LaggedDesign, cols: List[str], sum_to_one: bool, hac_lags: int = 6,
+                   w0: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """
+    Dimson fit of `cols`: weights are the lag coefficients summed per asset.
+
+    Fitted values and residuals cover the design's fitted periods (the first
+    n_lags dates are dropped); hac_se holds the standard errors of the
+    individual lag coefficients, in the order of lag_weights.stack(). w0 is
+    an optional warm start of the lag coefficients (k x L+1).
+    """
+    B = design.fit_lags(cols, sum_to_one=sum_to_one, w0=w0)
+    Z = design.lagged_frame(cols)
+    yhat = Z.values.dot(B.ravel())
+    resid = design.y_aligned.values - yhat
+    index = design.y_aligned.index
+    return {
+        "weights": pd.Series(B.sum(axis=1), index=cols),
+        "lag_weights": pd.DataFrame(B, index=cols, columns=pd.Index(range(design.n_lags + 1), name="lag")),
+        "residuals": pd.Series(resid, index=index),
+        "yhat": pd.Series(yhat, index=index),
+        "hac_se": hac_se(Z.values, resid, lag=hac_lags, weights=B.ravel(), sum_to_one=sum_to_one)
+    }
+
+def dimson_lags(cfg: Dict[str, Any]) -> int:
+    """
+    Number of Dimson lags (approach_A.dimson_lags), rejecting combinations the lagged design does not support.
+
+    The lag-expanded moments are plain, equally weighted least squares, so a
+    robust loss or an approach_A.half_life would be silently ignored.
+    """
+    n_lags = cfg["approach_A"].get("dimson_lags", 0) or 0
+    if n_lags > 0 and cfg.get("prelim", {}).get("loss", "squared") == "huber":
+        raise ValueError("approach_A.dimson_lags > 0 is not supported with prelim.loss 'huber'; "
+                         "set dimson_lags: 0 or loss: 'squared'")
+    if n_lags > 0 and cfg["approach_A"].get("half_life"):
+        raise ValueError("approach_A.dimson_lags > 0 is not supported with approach_A.half_life; "
+                         "set dimson_lags: 0 or half_life: null")
+    return n_lags
+
+def approach_A_pipeline(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], folds: Optional[TimeSeriesFolds] = None,
+                        stats: Optional[UniverseStats] = None, design: Optional[LaggedDesign] = None) -> Dict[str, Any]:
     max_k = cfg["approach_A"]["max_subset_size"]
     sum_to_one = not cfg["approach_A"]["allow_cash_less_than_one"]
     eps = cfg["approach_A"]["stepwise_epsilon_rmse"]
     mode = cfg.get("analysis", {}).get("mode", "in_sample")
+    # Dimson lags (approach_A.dimson_lags > 0): select assets on the lag-expanded design
+    stats = stats_for(X, y, cfg, stats)
+    # Exponentially weighted estimation (approach_A.half_life months): recent months count more
+    half_life = cfg["approach_A"].get("half_life")
+    if half_life:
+        stats = stats.reweighted(ewm_weights(len(y), half_life))
+    n_lags = dimson_lags(cfg)
+    if n_lags > 0 and design is None:
+        design = LaggedDesign(X, y, n_lags, make_splits(len(y) - n_lags, cfg.get("cv")))
+    # Prediction mode scores subsets by time-series CV RMSE
+    if mode == "prediction" and design is None:
+        folds = folds_for(X, y, cfg, folds)
     # simple forward stepwise then refit
-    cols = stepwise_nnls(X, y, max_k=max_k, sum_to_one=sum_to_one, eps_rmse=eps, mode=mode)
-    result = fit_one(X, y, cols, sum_to_one=sum_to_one)
+    cols = stepwise_nnls(X, y, max_k=max_k, sum_to_one=sum_to_one, eps_rmse=eps, mode=mode, folds=folds, stats=stats,
+                         design=design)
+    hac_lags = cfg.get("prelim", {}).get("hac_lags", 6)
+    result = fit_one(X, y, cols, sum_to_one=sum_to_one, hac_lags=hac_lags, stats=stats, design=design)
+    result["selected"] = cols
+    if half_life and cols and stats.loss == "squared":
+        # Carried by incremental updates (approach_A_refit())
+        result["ewm_state"] = EWMState.from_data(X[cols].values, y.values, half_life, sum_to_one=sum_to_one,
+                                                 w0=result["weights"].values)
+    n_params = len(cols) * (design.n_lags + 1 if design is not None else 1)
+    result["diagnostics"] = model_diagnostics(y.loc[result["yhat"].index], result["yhat"], result["residuals"], k=n_params)
+    return result
+
+def approach_A_refit(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], previous: Dict[str, Any],
+                     stats: Optional[UniverseStats] = None) -> Dict[str, Any]:
+    """
+    Refit an earlier Approach A selection without the stepwise search.
+
+    Used by incremental updates: the assets of `previous` are kept and their
+    weights (lag coefficients with Dimson lags) are re-solved on (X, y),
+    warm-started from the previous fit. With approach_A.half_life the
+    previous EWMState folds in only the periods it has not seen.
+
+    Args:
+        X: Asset returns
+        y: Fund returns
+        cfg: Configuration dict
+        previous: An earlier approach_A_pipeline() result (or its persisted summary)
+        stats: Cached universe statistics of (X, y)
+
+    Returns:
+        Result dict as from approach_A_pipeline()
+    """
+    sum_to_one = not cfg["approach_A"]["allow_cash_less_than_one"]
+    hac_lags = cfg.get("prelim", {}).get("hac_lags", 6)
+    half_life = cfg["approach_A"].get("half_life")
+    n_lags = dimson_lags(cfg)
+    cols = list(previous["selected"])
+    ewm = previous.get("ewm_state")
+    if half_life and ewm is not None:
+        ewm = copy.deepcopy(ewm)
+        Xc, yv = X[cols].values, y.values
+        for t in range(ewm.n_obs, len(yv)):
+            ewm.update(Xc[t], yv[t])
+        result = _weights_result(X, y, cols, ewm.weights, sum_to_one, hac_lags)
+        result["selected"], result["ewm_state"] = cols, ewm
+        result["diagnostics"] = model_diagnostics(y, result["yhat"], result["residuals"], k=len(cols))
+        return result
+    stats = stats_for(X, y, cfg, stats)
+    if half_life:
+        stats = stats.reweighted(ewm_weights(len(y), half_life))
+    design, w0 = None, previous["weights"].reindex(cols).fillna(0.0).values
+    if n_lags > 0:
+        design = LaggedDesign(X[cols], y, n_lags)
+        lag_weights = previous.get("lag_weights")
+        w0 = lag_weights.reindex(cols).fillna(0.0).values if lag_weights is not None else None
+    result = fit_one(X, y, cols, sum_to_one=sum_to_one, hac_lags=hac_lags, stats=stats, design=design, w0=w0)
     result["selected"] = cols
-    result["diagnostics"] = model_diagnostics(y, result["yhat"], result["residuals"], k=len(cols))
+    n_params = len(cols) * (n_lags + 1)
+    result["diagnostics"] = model_diagnostics(y.loc[result["yhat"].index], result["yhat"], result["residuals"], k=n_params)
     return result
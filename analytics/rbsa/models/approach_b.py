@@ -1,34 +1,110 @@
 from __future__ import annotations
 import numpy as np
 import pandas as pd
-from typing import Dict, Any, List, Tuple
-from sklearn.linear_model import ElasticNetCV
+from typing import Dict, Any, List, Tuple, Optional
+from joblib import Parallel, delayed
+from sklearn.linear_model import enet_path
 from sklearn.preprocessing import StandardScaler
 from rbsa_utils import hac_se, model_diagnostics
 from optimization import nnls_simplex
+from bootstrap import block_bootstrap_weights
+from cv import TimeSeriesFolds, blocked_splits, folds_for
+from universe import UniverseStats, stats_for
 
-def elasticnet_select(X: pd.DataFrame, y: pd.Series, alphas: list, n_lambdas: int, one_se: bool, cv_splits: int = 5, verbose: bool = False) -> List[str]:
+def _enet_fold_mse(Xs: np.ndarray, y: np.ndarray, fold, scale: np.ndarray,
+                   l1_ratios: List[float], alpha_grids: np.ndarray, max_iter: int) -> np.ndarray:
+    """Test MSE along every l1_ratio's lambda path for one fold, using the fold's precomputed Gram matrix."""
+    train, test = fold.train, fold.test
+    x_mean, y_mean = Xs[train].mean(axis=0), y[train].mean()
+    Xc, yc = np.asfortranarray(Xs[train] - x_mean), y[train] - y_mean
+    gram, xy = fold.train_moments.centered(scale)
+    X_test, y_test = Xs[test] - x_mean, y[test] - y_mean
+
+    mse = np.empty(alpha_grids.shape)
+    for i, l1 in enumerate(l1_ratios):
+        # Coordinate descent on the precomputed Gram, warm-started along the path
+        _, coefs, _ = enet_path(Xc, yc, l1_ratio=l1, alphas=alpha_grids[i], precompute=gram, Xy=xy,
+                                copy_X=False, check_input=False, max_iter=max_iter)
+        mse[i] = np.mean((y_test[:, None] - X_test @ coefs) ** 2, axis=0)
+    return mse
+
+def elasticnet_select(X: pd.DataFrame, y: pd.Series, alphas: list, n_lambdas: int, one_se: bool, cv_splits: int = 5,
+                      verbose: bool = False, n_jobs: Optional[int] = None, max_iter: int = 10000,
+                      folds: Optional[TimeSeriesFolds] = None) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Vote assets in by elastic-net CV over the l1_ratio grid.
+
+    All l1_ratios share one set of time-series folds; each fold's centered Gram
+    matrix comes from the precomputed fold moments and every ratio's lambda
+    path runs on it by warm-started coordinate descent, with folds in parallel
+    threads. The
+    lambda per ratio is the CV minimum (or the sparsest within one SE when
+    one_se), refitted on the full-sample Gram. Assets nonzero for at least
+    half the ratios are kept.
+
+    Args:
+        X: Asset returns
+        y: Fund returns
+        alphas: l1_ratio grid (0 = ridge is skipped)
+        n_lambdas: Lambda path length per l1_ratio
+        one_se: Use the one-standard-error rule for lambda
+        cv_splits: Number of CV folds
+        verbose: Print per-ratio selections and NNLS refits
+        n_jobs: Fold threads (None = all cores)
+        max_iter: Coordinate-descent iteration cap
+        folds: Precomputed time-series folds on X's columns (default: cv_splits blocked folds)
+
+    Returns:
+        (selected asset names, bootstrap selector: the chosen alpha path per
+        ratio and the vote threshold, see bootstrap.block_bootstrap_weights())
+    """
     from optimization import nnls_simplex
 
     scaler = StandardScaler(with_mean=True, with_std=True)
     Xs = scaler.fit_transform(X.values)
+    yv = y.values.astype(float)
     # l1_ratio in sklearn = alpha (L1 ratio). We'll grid over it.
     nonzero_counts = {}
 
     if verbose:
         print(f"\nElasticNet Selection (testing {len([a for a in alphas if a != 0])} l1_ratio values):")
         print("=" * 80)
-
-    for a in alphas:
-        # Skip l1_ratio=0 (pure Ridge) as ElasticNetCV doesn't support auto alpha grid for it
-        if a == 0:
-            if verbose:
+        # Skip l1_ratio=0 (pure Ridge) as the automatic lambda grid is undefined for it
+        for a in alphas:
+            if a == 0:
                 print(f"  l1_ratio={a:.2f}: SKIPPED (pure Ridge not supported)")
-            continue
+    l1_ratios = [a for a in alphas if a != 0]
+    if not l1_ratios:
+        raise ValueError("alpha_grid needs at least one non-zero l1_ratio")
 
-        en = ElasticNetCV(l1_ratio=a, alphas=n_lambdas, fit_intercept=True, cv=cv_splits, max_iter=10000, n_jobs=None)
-        en.fit(Xs, y.values)
-        coef = en.coef_
+    # Lambda grid per l1_ratio from the full sample (as ElasticNetCV), shared by all folds
+    xy_full = (Xs - Xs.mean(axis=0)).T @ (yv - yv.mean())
+    alpha_max = np.max(np.abs(xy_full)) / (len(yv) * np.asarray(l1_ratios))
+    alpha_grids = np.array([np.geomspace(a_max, a_max * 1e-3, n_lambdas) for a_max in alpha_max])
+
+    # One pass over shared folds, each reusing its precomputed Gram for every path
+    if folds is None:
+        folds = TimeSeriesFolds.from_data(X, y, blocked_splits(len(y), cv_splits))
+    fold_mse = np.stack(Parallel(n_jobs=-1 if n_jobs is None else n_jobs, prefer="threads")(
+        delayed(_enet_fold_mse)(Xs, yv, fold, scaler.scale_, l1_ratios, alpha_grids, max_iter) for fold in folds.folds
+    ))  # (folds, l1_ratios, lambdas)
+    mean_mse = fold_mse.mean(axis=0)
+    se_mse = fold_mse.std(axis=0) / np.sqrt(len(folds.folds))
+
+    # Full-sample centered Gram shared by the final fits
+    Xc, yc = np.asfortranarray(Xs - Xs.mean(axis=0)), yv - yv.mean()
+    gram = Xc.T @ Xc
+    chosen_alphas = []
+
+    for r, a in enumerate(l1_ratios):
+        best = int(np.argmin(mean_mse[r]))
+        if one_se:
+            # Largest lambda (sparsest model) within one standard error of the minimum
+            best = int(np.flatnonzero(mean_mse[r] <= mean_mse[r, best] + se_mse[r, best])[0])
+        chosen_alphas.append(alpha_grids[r, :best + 1])
+        _, coefs, _ = enet_path(Xc, yc, l1_ratio=a, alphas=chosen_alphas[-1], precompute=gram, Xy=xy_full,
+                                copy_X=False, check_input=False, max_iter=max_iter)
+        coef = coefs[:, -1]
         nz = [X.columns[i] for i, c in enumerate(coef) if abs(c) > 1e-10]
 
         if verbose:
@@ -87,13 +163,17 @@ def elasticnet_select(X: pd.DataFrame, y: pd.Series, alphas: list, n_lambdas: in
         if verbose:
             print(f"\nFinal selected assets: {', '.join(keep)}")
 
-    return keep
+    selector = {"engine": "elasticnet", "l1_ratios": l1_ratios, "alphas": chosen_alphas,
+                "threshold": threshold, "max_iter": max_iter}
+    return keep, selector
 
-def fit_refit_nnls(X: pd.DataFrame, y: pd.Series, cols: List[str], sum_to_one: bool) -> Dict[str, Any]:
-    w = nnls_simplex(X[cols].values, y.values, sum_to_one=sum_to_one)
+def _weights_result(X: pd.DataFrame, y: pd.Series, weights: pd.Series, sum_to_one: bool, hac_lags: int = 6) -> Dict[str, Any]:
+    """Fitted values, residuals and HAC SEs for fixed weights on weights.index."""
+    cols = list(weights.index)
+    w = weights.values
     yhat = X[cols].values.dot(w)
     resid = y.values - yhat
-    se = hac_se(X[cols].values, resid)
+    se = hac_se(X[cols].values, resid, lag=hac_lags, weights=w, sum_to_one=sum_to_one)
     return {
         "weights": pd.Series(w, index=cols),
         "residuals": pd.Series(resid, index=y.index),
@@ -101,22 +181,98 @@ def fit_refit_nnls(X: pd.DataFrame, y: pd.Series, cols: List[str], sum_to_one: b
         "hac_se": se
     }
 
-def approach_B_pipeline(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], verbose: bool = False) -> Dict[str, Any]:
+def fit_refit_nnls(X: pd.DataFrame, y: pd.Series, cols: List[str], sum_to_one: bool, hac_lags: int = 6,
+                   stats: Optional[UniverseStats] = None) -> Dict[str, Any]:
+    if stats is not None:
+        w = stats.fit(cols, sum_to_one=sum_to_one)
+    else:
+        w = nnls_simplex(X[cols].values, y.values, sum_to_one=sum_to_one)
+    return _weights_result(X, y, pd.Series(w, index=cols), sum_to_one, hac_lags)
+
+def approach_B_pipeline(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], verbose: bool = False,
+                        folds: Optional[TimeSeriesFolds] = None, stats: Optional[UniverseStats] = None) -> Dict[str, Any]:
     alphas = cfg["approach_B"]["alpha_grid"]
     nlam = cfg["approach_B"]["lambda_grid_points"]
     one_se = cfg["approach_B"]["one_se_rule"]
     sum_to_one = not cfg["approach_A"]["allow_cash_less_than_one"]
-    cols = elasticnet_select(X, y, alphas, nlam, one_se, cv_splits=5, verbose=verbose)
-    # Optional: trim by selection freq via bootstrap could be added here
+    hac_lags = cfg.get("prelim", {}).get("hac_lags", 6)
+    folds = folds_for(X, y, cfg, folds)
+    stats = stats_for(X, y, cfg, stats)
+
+    cols, selector = elasticnet_select(X, y, alphas, nlam, one_se, verbose=verbose,
+                                       n_jobs=cfg["approach_B"].get("cv_n_jobs"), folds=folds)
+    w_full = pd.Series(stats.fit(cols, sum_to_one=sum_to_one), index=cols).reindex(X.columns).fillna(0.0).values
+
+    # Trim by block-bootstrap selection frequency: the selection step is rerun on every replicate
+    boot = None
+    n_boot = cfg["approach_B"].get("bootstrap_replicates", 0)
+    if n_boot and len(cols) > 1:
+        cutoff = cfg["approach_B"]["selection_freq_cutoff"]
+        boot = block_bootstrap_weights(
+            X, y,
+            n_replicates=n_boot,
+            block_len=cfg["approach_B"]["bootstrap_blocks"],
+            sum_to_one=sum_to_one,
+            w0=w_full,
+            n_jobs=cfg["approach_B"].get("bootstrap_n_jobs", 1),
+            selector=selector
+        )
+        stable = [c for c in cols if boot["selection_freq"][c] >= cutoff]
+        if verbose:
+            print(f"\nBlock bootstrap ({n_boot} replicates, {boot['block_len']}-month blocks) selection frequency:")
+            for c in cols:
+                band = boot["weight_bands"].loc[c]
+                print(f"  {c}: {boot['selection_freq'][c]:.2f}  weight {' / '.join(f'{v:.3f}' for v in band)} ({' / '.join(band.index)})")
+            dropped = [c for c in cols if c not in stable]
+            if dropped:
+                print(f"  Dropping (freq < {cutoff}): {', '.join(dropped)}")
+        if stable:
+            cols = stable
+
     if verbose:
         print(f"\n{'='*80}")
         print(f"Refitting with NNLS (sum_to_one={sum_to_one})...")
-    result = fit_refit_nnls(X, y, cols, sum_to_one=sum_to_one)
+    result = fit_refit_nnls(X, y, cols, sum_to_one=sum_to_one, hac_lags=hac_lags, stats=stats)
     result["selected"] = cols
     result["diagnostics"] = model_diagnostics(y, result["yhat"], result["residuals"], k=len(cols))
+    if boot is not None:
+        result["bootstrap"] = {key: boot[key] for key in ("selection_freq", "weight_bands", "n_replicates", "block_len")}
     if verbose:
         print(f"Final weights:")
         for asset, weight in result["weights"].items():
             print(f"  {asset}: {weight:.4f}")
         print(f"\nDiagnostics: RMSE={result['diagnostics'].get('rmse', 'N/A'):.6f}")
     return result
+
+def approach_B_refit(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], previous: Dict[str, Any],
+                     stats: Optional[UniverseStats] = None) -> Dict[str, Any]:
+    """
+    Refit an earlier Approach B selection without the CV path or the bootstrap.
+
+    Used by incremental updates: the assets of `previous` are kept, the
+    weights are re-solved on (X, y) from the cached Gram matrix, warm-started
+    from the previous weights.
+
+    Args:
+        X: Asset returns
+        y: Fund returns
+        cfg: Configuration dict
+        previous: An earlier approach_B_pipeline() result (or its persisted summary)
+        stats: Cached universe statistics of (X, y)
+
+    Returns:
+        Result dict with weights, residuals, yhat, hac_se, selected and
+        diagnostics; the previous bootstrap summary is carried over
+    """
+    sum_to_one = not cfg["approach_A"]["allow_cash_less_than_one"]
+    hac_lags = cfg.get("prelim", {}).get("hac_lags", 6)
+    stats = stats_for(X, y, cfg, stats)
+    cols = list(previous["selected"])
+    w0 = previous["weights"].reindex(cols).fillna(0.0).values
+    w = stats.fit(cols, sum_to_one=sum_to_one, w0=w0)
+    result = _weights_result(X, y, pd.Series(w, index=cols), sum_to_one, hac_lags)
+    result["selected"] = cols
+    result["diagnostics"] = model_diagnostics(y, result["yhat"], result["residuals"], k=len(cols))
+    if "bootstrap" in previous:
+        result["bootstrap"] = previous["bootstrap"]
+    return result
@@ -1,9 +1,9 @@
 from __future__ import annotations
 import numpy as np
 import pandas as pd
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from rbsa_utils import hac_se, model_diagnostics
-from optimization import nnls_simplex
+from optimization import nnls_simplex, nnls_simplex_gram
 
 
 def dirichlet_spike_slab_mcmc(
@@ -12,7 +12,9 @@ def dirichlet_spike_slab_mcmc(
     n_samples: int = 5000,
     n_burnin: int = 1000,
     pip_threshold: float = 0.5,
-    verbose: bool = False
+    verbose: bool = False,
+    hac_lags: int = 6,
+    init: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Bayesian RBSA with Dirichlet prior on weights and spike-and-slab for inclusion.
@@ -24,9 +26,13 @@ def dirichlet_spike_slab_mcmc(
         n_burnin: Number of burn-in samples
         pip_threshold: Posterior inclusion probability threshold
         verbose: Print progress
+        hac_lags: Newey-West lag for the refit's HAC standard errors
+        init: Chain state (gamma, w, sigma2) to start from, e.g. the mcmc_state
+            of an earlier run on the same assets; a random start when None
 
     Returns:
-        Dictionary with selected assets, posterior inclusion probabilities, weight distributions
+        Dictionary with selected assets, posterior inclusion probabilities,
+        weight distributions and mcmc_state (the final chain state)
     """
     n_obs = len(y)
     n_assets = len(X.columns)
@@ -46,9 +52,12 @@ def dirichlet_spike_slab_mcmc(
     sigma2_prior_scale = 0.01  # Inverse-Gamma scale for error variance
 
     # Initialize
-    gamma = np.random.binomial(1, prior_inclusion, n_assets)  # Inclusion indicators
-    w = np.random.dirichlet(alpha_dir)  # Weights (simplex)
-    sigma2 = 0.001  # Error variance
+    if init is not None:
+        gamma, w, sigma2 = np.array(init["gamma"]).copy(), np.array(init["w"], dtype=float).copy(), float(init["sigma2"])
+    else:
+        gamma = np.random.binomial(1, prior_inclusion, n_assets)  # Inclusion indicators
+        w = np.random.dirichlet(alpha_dir)  # Weights (simplex)
+        sigma2 = 0.001  # Error variance
 
     # Storage for posterior samples
     gamma_samples = np.zeros((n_samples - n_burnin, n_assets))
@@ -179,7 +188,7 @@ def dirichlet_spike_slab_mcmc(
             "weights": pd.Series(w_final, index=selected_assets),
             "residuals": pd.Series(resid, index=y.index),
             "yhat": pd.Series(yhat, index=y.index),
-            "hac_se": hac_se(X[selected_assets].values, resid)
+            "hac_se": hac_se(X[selected_assets].values, resid, lag=hac_lags, weights=w_final, sum_to_one=True)
         }
     else:
         # No assets selected
@@ -202,11 +211,13 @@ def dirichlet_spike_slab_mcmc(
         "sigma2": sigma2_samples,
         "log_likelihood": log_likelihood_samples
     }
+    result["mcmc_state"] = {"gamma": gamma.copy(), "w": w.copy(), "sigma2": sigma2, "assets": assets}
 
     return result
 
 
-def approach_C_pipeline(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], verbose: bool = False) -> Dict[str, Any]:
+def approach_C_pipeline(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], verbose: bool = False, folds=None,
+                        stats=None, init: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Approach C: Bayesian RBSA with Dirichlet-spike prior.
 
@@ -214,12 +225,25 @@ def approach_C_pipeline(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], verb
     - Posterior inclusion probabilities (PIP)
     - Credible intervals on weights
     - Model uncertainty quantification
+
+    `folds` and `stats` are accepted for a uniform approach signature; the MCMC uses neither.
+    `init` warm-starts the chain from an earlier run's mcmc_state (same assets),
+    which then needs only approach_C.mcmc_warm_burnin burn-in samples; the
+    number of kept samples is unchanged.
     """
     n_samples = cfg.get("approach_C", {}).get("mcmc_samples", 5000)
     n_burnin = cfg.get("approach_C", {}).get("mcmc_burnin", 1000)
     pip_threshold = cfg.get("approach_C", {}).get("pip_threshold", 0.5)
 
-    result = dirichlet_spike_slab_mcmc(X, y, n_samples, n_burnin, pip_threshold, verbose)
+    hac_lags = cfg.get("prelim", {}).get("hac_lags", 6)
+
+    if init is not None and list(init.get("assets", [])) != X.columns.tolist():
+        init = None
+    if init is not None:
+        warm_burnin = min(cfg.get("approach_C", {}).get("mcmc_warm_burnin", 200), n_burnin)
+        n_samples, n_burnin = n_samples - n_burnin + warm_burnin, warm_burnin
+
+    result = dirichlet_spike_slab_mcmc(X, y, n_samples, n_burnin, pip_threshold, verbose, hac_lags=hac_lags, init=init)
 
     # Select assets based on PIP
     selected_assets = result["pip"][result["pip"] >= pip_threshold].index.tolist()
@@ -241,3 +265,54 @@ def approach_C_pipeline(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], verb
         print(f"\nDiagnostics: R²={result['diagnostics'].get('r2', 0):.4f}, RMSE={result['diagnostics'].get('rmse', 0):.6f}")
 
     return result
+
+
+def approach_C_refit(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], previous: Dict[str, Any],
+                     stats=None) -> Dict[str, Any]:
+    """
+    Refit the NNLS weights of an earlier Approach C selection without sampling.
+
+    Used by incremental updates: the selected assets, posterior summaries and
+    chain state of `previous` are carried over, only the weights, fitted
+    values and diagnostics reflect (X, y).
+
+    Args:
+        X: Asset returns (excess)
+        y: Fund returns (excess)
+        cfg: Configuration dict
+        previous: An earlier approach_C_pipeline() result (or its persisted summary)
+        stats: Cached universe statistics of (X, y); their plain moments feed the
+            Gram solve (no Huber IRLS, as in approach_C_pipeline())
+
+    Returns:
+        Result dict with the same keys as approach_C_pipeline() except mcmc_samples
+    """
+    hac_lags = cfg.get("prelim", {}).get("hac_lags", 6)
+    cols = list(previous["selected"])
+    if cols:
+        if stats is not None:
+            w = nnls_simplex_gram(*stats.gram_subset(cols), sum_to_one=True)
+        else:
+            w = nnls_simplex(X[cols].values, y.values, sum_to_one=True)
+        yhat = X[cols].values.dot(w)
+        resid = y.values - yhat
+        result = {
+            "weights": pd.Series(w, index=cols),
+            "residuals": pd.Series(resid, index=y.index),
+            "yhat": pd.Series(yhat, index=y.index),
+            "hac_se": hac_se(X[cols].values, resid, lag=hac_lags, weights=w, sum_to_one=True)
+        }
+    else:
+        result = {
+            "weights": pd.Series(dtype=float),
+            "residuals": pd.Series(y.values, index=y.index),
+            "yhat": pd.Series(np.zeros(len(y)), index=y.index),
+            "hac_se": np.array([])
+        }
+    for key in ("pip", "posterior_mean_weights", "posterior_std_weights", "posterior_weight_lower",
+                "posterior_weight_upper", "mcmc_state"):
+        if key in previous:
+            result[key] = previous[key]
+    result["selected"] = cols
+    result["diagnostics"] = model_diagnostics(y, result["yhat"], result["residuals"], k=len(cols))
+    return result
@@ -1,16 +1,64 @@
 from __future__ import annotations
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from prelim import correlation_clustering, pick_medoids
-from models.approach_a import approach_A_pipeline
+from rbsa_utils import model_diagnostics_batch
+from models.approach_a import approach_A_pipeline, approach_A_refit, dimson_lags
+from cv import TimeSeriesFolds, make_splits
+from universe import UniverseStats, stats_for
+from lagged import LaggedDesign
 
-def approach_D_pipeline(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any]) -> Dict[str, Any]:
-    best = None
+def approach_D_pipeline(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], folds: Optional[TimeSeriesFolds] = None,
+                        stats: Optional[UniverseStats] = None) -> Dict[str, Any]:
+    # Correlation and linkage are computed once and reused for every cluster count
+    stats = stats_for(X, y, cfg, stats)
+    # Likewise the lag-expanded moments when Approach A fits Dimson lags
+    n_lags = dimson_lags(cfg)
+    design = None
+    if n_lags > 0:
+        # Assemble once on the full universe; each cluster count slices its medoids
+        design = LaggedDesign(X, y, n_lags, make_splits(len(y) - n_lags, cfg.get("cv"))).precompute(
+            folds=cfg.get("analysis", {}).get("mode", "in_sample") == "prediction"
+        )
+    results = []
     for k in range(cfg["approach_D"]["cluster_k_min"], cfg["approach_D"]["cluster_k_max"]+1):
-        clusters = correlation_clustering(X, k=k, method=cfg["approach_D"]["linkage"])
-        medoids = pick_medoids(X, clusters)
-        res = approach_A_pipeline(X[medoids], y, cfg)
+        clusters = correlation_clustering(X, k=k, method=cfg["approach_D"]["linkage"], stats=stats)
+        medoids = pick_medoids(X, clusters, stats=stats)
+        res = approach_A_pipeline(X[medoids], y, cfg, folds=folds.subset(medoids) if folds is not None else None,
+                                  stats=stats.subset(medoids),
+                                  design=design.subset(medoids) if design is not None else None)
         res["medoids_k"] = k
-        if best is None or res["diagnostics"]["rmse"] < best["diagnostics"]["rmse"]:
-            best = res
-    return best
+        results.append(res)
+    if not results:
+        return None
+
+    # Score every cluster count in one pass; first minimum wins ties, as before
+    diag = model_diagnostics_batch(
+        y.loc[results[0]["yhat"].index],
+        np.column_stack([res["yhat"].values for res in results]),
+        k=[len(res["selected"]) for res in results]
+    )
+    return results[int(np.argmin(diag["rmse"].values))]
+
+def approach_D_refit(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], previous: Dict[str, Any],
+                     stats: Optional[UniverseStats] = None) -> Dict[str, Any]:
+    """
+    Refit an earlier Approach D selection without reclustering.
+
+    Used by incremental updates: the previous medoid selection is kept and
+    refitted as in approach_A_refit(); the cluster count is carried over.
+
+    Args:
+        X: Asset returns
+        y: Fund returns
+        cfg: Configuration dict
+        previous: An earlier approach_D_pipeline() result (or its persisted summary)
+        stats: Cached universe statistics of (X, y)
+
+    Returns:
+        Result dict as from approach_D_pipeline()
+    """
+    result = approach_A_refit(X, y, cfg, previous, stats=stats)
+    result["medoids_k"] = previous.get("medoids_k")
+    return result
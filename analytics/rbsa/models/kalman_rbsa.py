@@ -0,0 +1,183 @@
+"""
+Dynamic-weight RBSA as a linear Gaussian state-space model.
+
+    y_t = x_t' w_t + e_t,        e_t ~ N(0, σ²)
+    w_t = w_{t-1} + η_t,         η_t ~ N(0, q σ² P)
+
+With the budget constraint, P = I - 11'/k projects the state noise (and the
+initial covariance) onto directions that keep Σw fixed, so Σw_t = 1 holds
+exactly throughout the filter and smoother; otherwise P = I. Non-negativity
+is imposed by projecting the filtered and smoothed means onto the simplex
+(the Gaussian recursions themselves are left exact).
+
+The prior on the first state is fitted on a burn-in window (simplex NNLS on
+the first periods) and the filter runs on the periods after it, so a
+filtered weight uses no data after its date (the smoothed weights use the
+whole sample by construction).
+
+The noise ratio q is estimated by maximising the likelihood with σ²
+concentrated out, over a bounded one-dimensional search on log q. Each
+evaluation is a single O(T k²) forward pass with scalar innovations, and the
+smoother is the Durbin-Koopman backward recursion, which needs no inversion
+of the (singular, under the budget constraint) state covariance.
+"""
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Optional, Tuple
+from scipy.optimize import minimize_scalar
+from optimization import nnls_simplex_gram, project_simplex
+
+# log10 search range for the state-to-observation noise ratio q
+LOG_Q_BOUNDS = (-8.0, 2.0)
+
+# Default burn-in: this many periods, or two per asset if more (at most half the sample)
+MIN_BURN_IN = 24
+
+
+def _state_noise_shape(k: int, sum_to_one: bool) -> np.ndarray:
+    """P: the identity, or the projector onto {d : Σd = 0} under the budget constraint."""
+    return np.eye(k) - np.full((k, k), 1.0 / k) if sum_to_one else np.eye(k)
+
+
+def kalman_filter(X: np.ndarray, y: np.ndarray, q: float, a0: np.ndarray, P0: np.ndarray,
+                  Pshape: np.ndarray, store: bool = False) -> Dict[str, Any]:
+    """
+    Random-walk-coefficient Kalman filter with σ² = 1 (scale-free form).
+
+    Args:
+        X: Regressors (T x k)
+        y: Observations (T,)
+        q: State noise ratio; state noise covariance is q * Pshape
+        a0: Initial state mean (k,)
+        P0: Initial state covariance (k x k), in units of σ²
+        Pshape: State noise shape (k x k)
+        store: Keep the predicted states, gains and innovations for smoothing
+
+    Returns:
+        Dict with sigma2 (concentrated σ² estimate), loglik (concentrated
+        log-likelihood), filtered means (T x k) and, if store, a_pred, P_pred,
+        K, v, F
+    """
+    T, k = X.shape
+    Q = q * Pshape
+    a, P = a0.astype(float).copy(), P0.astype(float).copy()
+    filtered = np.empty((T, k))
+    v_all, F_all = np.empty(T), np.empty(T)
+    if store:
+        a_pred, P_pred, K_all = np.empty((T, k)), np.empty((T, k, k)), np.empty((T, k))
+
+    for t in range(T):
+        P = P + Q
+        x = X[t]
+        Px = P @ x
+        F = x @ Px + 1.0
+        v = y[t] - x @ a
+        K = Px / F
+        if store:
+            a_pred[t], P_pred[t], K_all[t] = a, P, K
+        a = a + K * v
+        P = P - np.outer(K, Px)
+        filtered[t] = a
+        v_all[t], F_all[t] = v, F
+
+    sigma2 = float(np.mean(v_all ** 2 / F_all))
+    loglik = -0.5 * T * (np.log(2 * np.pi * sigma2) + 1.0) - 0.5 * float(np.log(F_all).sum())
+    out = {"sigma2": sigma2, "loglik": loglik, "filtered": filtered, "v": v_all, "F": F_all}
+    if store:
+        out.update(a_pred=a_pred, P_pred=P_pred, K=K_all)
+    return out
+
+
+def kalman_smoother(X: np.ndarray, kf: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Durbin-Koopman state smoother for the random-walk model.
+
+    Backward recursion r_{t-1} = x_t v_t / F_t + L_t' r_t, N_{t-1} = x_t x_t' / F_t + L_t' N_t L_t
+    with L_t = I - K_t x_t'; smoothed means a_t + P_t r_{t-1} and variances
+    P_t - P_t N_{t-1} P_t (in units of σ²).
+
+    Returns:
+        (smoothed means (T x k), smoothed variances of each weight (T x k))
+    """
+    T, k = X.shape
+    a_pred, P_pred, K, v, F = kf["a_pred"], kf["P_pred"], kf["K"], kf["v"], kf["F"]
+    r, N = np.zeros(k), np.zeros((k, k))
+    smoothed, var = np.empty((T, k)), np.empty((T, k))
+    eye = np.eye(k)
+    for t in range(T - 1, -1, -1):
+        x = X[t]
+        L = eye - np.outer(K[t], x)
+        r = x * (v[t] / F[t]) + L.T @ r
+        N = np.outer(x, x) / F[t] + L.T @ N @ L
+        P = P_pred[t]
+        smoothed[t] = a_pred[t] + P @ r
+        var[t] = np.einsum("ij,ji->i", P, eye - N @ P)
+    return smoothed, var
+
+
+def kalman_rbsa(
+    X: pd.DataFrame,
+    y: pd.Series,
+    sum_to_one: bool = True,
+    q: Optional[float] = None,
+    burn_in: Optional[int] = None,
+    init_var: float = 0.1
+) -> Dict[str, Any]:
+    """
+    Time-varying style weights from a random-walk state-space model.
+
+    Args:
+        X: Asset returns (T x k) of the subset
+        y: Fund returns (T,)
+        sum_to_one: Impose the budget constraint
+        q: State-to-observation noise ratio (estimated when None)
+        burn_in: Leading periods the prior is fitted on (default: max(MIN_BURN_IN,
+            2k), at most half the sample); the filter starts after them
+        init_var: Initial variance of each weight around the burn-in weights
+            (converted to units of σ² with the burn-in residual variance)
+
+    Returns:
+        Dict with:
+            - filtered: DataFrame (dates after the burn-in x assets), simplex-projected filtered weights
+            - smoothed: DataFrame (dates after the burn-in x assets), simplex-projected smoothed weights
+            - smoothed_se: DataFrame of smoothed weight standard errors
+            - q, sigma2, loglik: noise ratio, observation variance, log-likelihood
+            - residuals: Series y - x_t' w_t (smoothed)
+            - burn_in: periods used for the prior
+    """
+    Xv, yv = X.values.astype(float), y.values.astype(float)
+    T, k = Xv.shape
+    if burn_in is None:
+        burn_in = min(max(MIN_BURN_IN, 2 * k), T // 2)
+    if not 1 <= burn_in < T:
+        raise ValueError(f"burn_in must be in [1, {T - 1}], got {burn_in}")
+    Xb, yb = Xv[:burn_in], yv[:burn_in]
+    w0 = nnls_simplex_gram(Xb.T @ Xb, Xb.T @ yb, sum_to_one=sum_to_one)
+    Pshape = _state_noise_shape(k, sum_to_one)
+    resid0 = yb - Xb @ w0
+    P0 = init_var / max(float(resid0 @ resid0) / burn_in, 1e-300) * Pshape
+    Xv, yv = Xv[burn_in:], yv[burn_in:]
+    dates = X.index[burn_in:]
+
+    if q is None:
+        res = minimize_scalar(
+            lambda lq: -kalman_filter(Xv, yv, 10.0 ** lq, w0, P0, Pshape)["loglik"],
+            bounds=LOG_Q_BOUNDS, method="bounded", options={"xatol": 1e-2}
+        )
+        q = 10.0 ** res.x
+
+    kf = kalman_filter(Xv, yv, q, w0, P0, Pshape, store=True)
+    smoothed, var = kalman_smoother(Xv, kf)
+    smoothed = project_simplex(smoothed, sum_to_one=sum_to_one)
+
+    return {
+        "filtered": pd.DataFrame(project_simplex(kf["filtered"], sum_to_one=sum_to_one), index=dates, columns=X.columns),
+        "smoothed": pd.DataFrame(smoothed, index=dates, columns=X.columns),
+        "smoothed_se": pd.DataFrame(np.sqrt(np.clip(var, 0.0, None) * kf["sigma2"]), index=dates, columns=X.columns),
+        "q": float(q),
+        "sigma2": kf["sigma2"],
+        "loglik": kf["loglik"],
+        "residuals": pd.Series(yv - np.einsum("ti,ti->t", Xv, smoothed), index=y.index[burn_in:]),
+        "burn_in": int(burn_in)
+    }
@@ -24,3 +24,177 @@ def nnls_simplex(X: np.ndarray, y: np.ndarray, sum_to_one: bool = True, tol: flo
     if sum_to_one and w.sum() > 0:
         w = w / w.sum()
     return w
+
+def nnls_simplex_gram(G: np.ndarray, c: np.ndarray, sum_to_one: bool = True, w0: Optional[np.ndarray] = None,
+                      tol: float = 1e-10, max_iter: Optional[int] = None) -> np.ndarray:
+    """
+    Exact active-set solver for min_w 0.5 w'Gw - c'w  s.t. w >= 0 (and Σw = 1).
+
+    With G = X'X and c = X'y this is the nnls_simplex() problem, but it only
+    touches k x k sufficient statistics, so repeated fits on resampled,
+    windowed or reweighted data cost O(k³) instead of a fresh SLSQP run.
+    A Lawson-Hanson style primal active-set method: the passive set is solved
+    as an equality-constrained least-squares system and assets enter by
+    largest KKT violation. Passing the previous solution as w0 (warm start)
+    usually converges in one or two iterations.
+
+    Args:
+        G: Gram matrix X'X (k x k)
+        c: Cross moments X'y (k,)
+        sum_to_one: Impose the budget constraint Σw = 1
+        w0: Optional feasible starting point; its support seeds the active set
+        tol: KKT tolerance
+        max_iter: Iteration cap (default 3k + 10)
+
+    Returns:
+        Optimal weights (k,)
+    """
+    G = np.asarray(G, dtype=float)
+    c = np.asarray(c, dtype=float)
+    k = len(c)
+    if k == 0:
+        return np.zeros(0)
+    max_iter = max_iter or 3 * k + 10
+    scale = max(np.abs(np.diag(G)).max(), 1e-300)
+
+    def solve_passive(P):
+        # Stationarity on the passive set (plus the budget row if constrained)
+        idx = np.flatnonzero(P)
+        if sum_to_one:
+            A = np.zeros((len(idx) + 1, len(idx) + 1))
+            A[:-1, :-1] = G[np.ix_(idx, idx)]
+            A[:-1, -1] = A[-1, :-1] = 1.0
+            rhs = np.append(c[idx], 1.0)
+        else:
+            A, rhs = G[np.ix_(idx, idx)], c[idx]
+        try:
+            sol = np.linalg.solve(A, rhs)
+        except np.linalg.LinAlgError:
+            # Collinear passive set: minimum-norm solution
+            sol = np.linalg.lstsq(A, rhs, rcond=None)[0]
+        z = np.zeros(k)
+        z[idx] = sol[:len(idx)]
+        return z
+
+    if w0 is None:
+        # Cold start from the best single asset (or zero without the budget)
+        w = np.zeros(k)
+        if sum_to_one:
+            w[int(np.argmin(0.5 * np.diag(G) - c))] = 1.0
+    else:
+        w = np.clip(np.asarray(w0, dtype=float), 0.0, None)
+        if sum_to_one:
+            s = w.sum()
+            w = w / s if s > 0 else np.full(k, 1.0 / k)
+    P = w > 0
+
+    for _ in range(max_iter):
+        if P.any():
+            z = solve_passive(P)
+            # Step back along w -> z until the first passive weight hits zero
+            while np.any(z[P] <= 0):
+                neg = P & (z <= 0)
+                alpha = np.min(w[neg] / (w[neg] - z[neg]))
+                w = w + alpha * (z - w)
+                P = P & (w > tol)
+                w[~P] = 0.0
+                if not P.any():
+                    break
+                z = solve_passive(P)
+            if P.any():
+                w = z
+
+        # KKT check: gradient off the passive set must not undercut the multiplier
+        grad = G @ w - c
+        if sum_to_one:
+            lam = -grad[P].mean() if P.any() else -grad.min()
+            viol = -(grad + lam)
+        else:
+            viol = -grad
+        viol[P] = -np.inf
+        j = int(np.argmax(viol))
+        if viol[j] <= tol * scale:
+            break
+        if not P.any() and sum_to_one:
+            w = np.zeros(k)
+            w[j] = 1.0
+        P[j] = True
+
+    if sum_to_one and w.sum() > 0:
+        w = w / w.sum()
+    return np.clip(w, 0.0, None)
+
+def project_simplex(V: np.ndarray, sum_to_one: bool = True) -> np.ndarray:
+    """
+    Euclidean projection of each row of V onto the probability simplex
+    (or onto the non-negative orthant when not sum_to_one).
+
+    Uses the sort-based threshold of Duchi et al. (2008), vectorised over rows.
+
+    Args:
+        V: Points (k,) or (n x k)
+
+    Returns:
+        Projected points, same shape as V
+    """
+    V = np.asarray(V, dtype=float)
+    if not sum_to_one:
+        return np.clip(V, 0.0, None)
+    U = np.atleast_2d(V)
+    k = U.shape[1]
+    S = -np.sort(-U, axis=1)
+    css = np.cumsum(S, axis=1) - 1.0
+    ind = np.arange(1, k + 1)
+    rho = (S - css / ind > 0).sum(axis=1)
+    theta = css[np.arange(len(U)), rho - 1] / rho
+    out = np.clip(U - theta[:, None], 0.0, None)
+    return out.reshape(V.shape)
+
+LOSSES = ("squared", "huber")
+
+def huber_weights(resid: np.ndarray, delta: float = 1.345) -> np.ndarray:
+    """
+    IRLS observation weights of the Huber loss: 1 inside delta·σ̂, delta·σ̂/|r| outside.
+
+    σ̂ is the normalised median absolute deviation of the residuals; all
+    weights are 1 when it is zero.
+    """
+    resid = np.asarray(resid, dtype=float)
+    scale = np.median(np.abs(resid - np.median(resid))) / 0.6745
+    if scale <= 0:
+        return np.ones_like(resid)
+    return np.minimum(1.0, delta * scale / np.maximum(np.abs(resid), 1e-300))
+
+def huber_simplex(X: np.ndarray, y: np.ndarray, sum_to_one: bool = True, delta: float = 1.345,
+                  w0: Optional[np.ndarray] = None, max_iter: int = 50, tol: float = 1e-8) -> np.ndarray:
+    """
+    Simplex-constrained Huber regression by iteratively reweighted least squares.
+
+    Each iteration reweights the observations with huber_weights() of the
+    current residuals, forms the weighted Gram X'ΩX and X'Ωy, and re-solves
+    with nnls_simplex_gram() warm-started from the current weights (the active
+    set rarely changes, so a step is usually a single linear solve).
+
+    Args:
+        X: Regressors (T x k)
+        y: Target (T,)
+        sum_to_one: Impose the budget constraint
+        delta: Huber threshold in units of the residual scale (1.345: 95% efficiency under normality)
+        w0: Starting weights (default: the least-squares simplex fit)
+        max_iter: Maximum IRLS iterations
+        tol: Stop when no weight moves by more than this
+
+    Returns:
+        Weights (k,)
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    w = nnls_simplex_gram(X.T @ X, X.T @ y, sum_to_one=sum_to_one) if w0 is None else np.asarray(w0, dtype=float)
+    for _ in range(max_iter):
+        Xw = X * huber_weights(y - X @ w, delta)[:, None]
+        w_new = nnls_simplex_gram(Xw.T @ X, Xw.T @ y, sum_to_one=sum_to_one, w0=w)
+        converged = np.abs(w_new - w).max() <= tol
+        w = w_new
+        if converged:
+            break
+    return w
@@ -0,0 +1,146 @@
+"""
+Persisted state of a pipeline run, for incremental month-end updates.
+
+A full run saves the prepared design (X, y), its full-sample moments, the
+preprocessing parameters (de-smoothing coefficients, winsorisation bounds),
+each approach's selection and weights, the MCMC chain state, the Kalman
+noise ratio and the returned output. The next update appends only the new
+periods: the moments X'X, X'y, y'y, ΣX and Σy take one rank-one update per
+period (O(N²) each) instead of a pass over the history, and selections that
+are still valid are refitted from them instead of being searched again.
+
+History is append-only between full runs: rows already in the state are not
+re-read, and new rows are de-smoothed and winsorised with the saved
+parameters, so revisions to past data (or re-estimated parameters) take
+effect at the next full run, which an update triggers after update.reselect_months
+periods or on any change of configuration or universe.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import pickle
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+import numpy as np
+import pandas as pd
+from cv import FoldMoments
+
+# Result keys kept per approach (sample-length series are dropped, the MCMC draws too)
+PERSISTED_RESULT_KEYS = (
+    "selected", "weights", "lag_weights", "medoids_k", "diagnostics", "bootstrap", "pip", "posterior_mean_weights",
+    "posterior_std_weights", "posterior_weight_lower", "posterior_weight_upper", "mcmc_state", "ewm_state"
+)
+
+DEFAULT_STATE_PATH = os.path.join("_cache_diskcache", "pipeline_state", "rbsa_state.pkl")
+
+
+def config_digest(cfg: Dict[str, Any]) -> str:
+    """Hash of the configuration, ignoring the update section itself."""
+    relevant = {k: v for k, v in cfg.items() if k != "update"}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def state_path(cfg: Dict[str, Any], project_root: str) -> str:
+    """Absolute path of the state file (config update.state_path, relative to the project root)."""
+    path = cfg.get("update", {}).get("state_path") or DEFAULT_STATE_PATH
+    return path if os.path.isabs(path) else os.path.join(project_root, path)
+
+
+@dataclass
+class PipelineState:
+    """
+    Everything an incremental update needs from the previous run.
+
+    Example:
+        >>> state = PipelineState.load(path)
+        >>> state.append(X_new, y_new)       # rank-one moment updates
+        >>> state.moments.xx                 # X'X over the whole history
+    """
+    config_digest: str
+    X: pd.DataFrame
+    y: pd.Series
+    moments: FoldMoments
+    results: Dict[str, Dict[str, Any]]
+    full_run_at: int
+    best_key: Optional[str] = None
+    kalman: Optional[Dict[str, Any]] = None
+    output: Optional[Dict[str, Any]] = None
+    preprocessing: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_run(
+        cls,
+        cfg: Dict[str, Any],
+        X: pd.DataFrame,
+        y: pd.Series,
+        results: Dict[str, Dict[str, Any]],
+        best_key: Optional[str] = None,
+        kalman: Optional[Dict[str, Any]] = None,
+        output: Optional[Dict[str, Any]] = None,
+        preprocessing: Optional[Dict[str, Any]] = None
+    ) -> "PipelineState":
+        """
+        State after a full run on (X, y).
+
+        Args:
+            cfg: Configuration the run used
+            X, y: Prepared design and fund returns
+            results: Approach results keyed by approach ("A".."D")
+            best_key: Key of the selected approach
+            kalman: {"assets", "q"} of the style-drift Kalman fit
+            output: The pipeline output
+            preprocessing: prepare_data() de-smoothing parameters and winsorisation bounds
+        """
+        moments = FoldMoments.from_arrays(X.values.astype(float), y.values.astype(float))
+        state = cls(config_digest(cfg), X, y, moments, {}, full_run_at=len(y), preprocessing=preprocessing)
+        state.set_run(results, best_key, kalman, output)
+        return state
+
+    def set_run(
+        self,
+        results: Dict[str, Dict[str, Any]],
+        best_key: Optional[str] = None,
+        kalman: Optional[Dict[str, Any]] = None,
+        output: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Record the results of a run on the current history (see from_run())."""
+        self.results = {key: {k: v for k, v in res.items() if k in PERSISTED_RESULT_KEYS} for key, res in results.items()}
+        self.best_key, self.kalman, self.output = best_key, kalman, output
+
+    @property
+    def n_obs(self) -> int:
+        return len(self.y)
+
+    def new_rows(self, y: pd.Series) -> pd.Index:
+        """Dates of y after the last period in the state."""
+        return y.index[y.index > self.y.index[-1]]
+
+    def append(self, X_new: pd.DataFrame, y_new: pd.Series) -> None:
+        """Append periods to the history, updating the moments one period at a time."""
+        X_new = X_new[self.X.columns]
+        m = self.moments
+        for x, yt in zip(X_new.values.astype(float), y_new.values.astype(float)):
+            m.xx += np.outer(x, x)
+            m.xy += x * yt
+            m.yy += yt * yt
+            m.sx += x
+            m.sy += yt
+            m.n += 1
+        self.X = pd.concat([self.X, X_new])
+        self.y = pd.concat([self.y, y_new])
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path: str) -> Optional["PipelineState"]:
+        """The saved state, or None when there is none (or it cannot be read)."""
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        return state if isinstance(state, PipelineState) else None
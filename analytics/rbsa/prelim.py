@@ -1,25 +1,33 @@
 from __future__ import annotations
 import pandas as pd
 import numpy as np
-from typing import Dict, Tuple, Optional, List
+from dataclasses import dataclass, field
+from typing import Dict, Tuple, Optional, List, Any
 from scipy.cluster.hierarchy import linkage, fcluster
-from sklearn.decomposition import PCA
+from regimes import detect_regimes, regime_labels
 
-def winsorize(df: pd.DataFrame, p: float) -> pd.DataFrame:
+def winsor_bounds(df: pd.DataFrame, p: float) -> Tuple[pd.Series, pd.Series]:
+    """Per-column (lower, upper) winsorisation quantiles."""
+    return df.quantile(p, axis=0), df.quantile(1-p, axis=0)
+
+def winsorize(df: pd.DataFrame, p: float, bounds: Optional[Tuple[pd.Series, pd.Series]] = None) -> pd.DataFrame:
+    """Clip each column at its p / 1-p quantiles (or at precomputed `bounds` from winsor_bounds())."""
     if p is None or p <= 0:
         return df.copy()
-    lower = df.quantile(p, axis=0)
-    upper = df.quantile(1-p, axis=0)
-    return df.clip(lower, upper, axis=1)
-
-def correlation_clustering(rets: pd.DataFrame, k: int, method: str = "average") -> List[List[str]]:
-    # distance = sqrt(2*(1 - corr))
-    corr = rets.corr().fillna(0.0)
-    dist = np.sqrt(2*(1 - corr.clip(-1,1)))
-    # convert to condensed
-    iu = np.triu_indices_from(dist, 1)
-    dvec = dist.values[iu]
-    Z = linkage(dvec, method=method)
+    lower, upper = bounds if bounds is not None else winsor_bounds(df, p)
+    return df.clip(lower.reindex(df.columns), upper.reindex(df.columns), axis=1)
+
+def correlation_clustering(rets: pd.DataFrame, k: int, method: str = "average", stats=None) -> List[List[str]]:
+    # distance = sqrt(2*(1 - corr)); correlation and linkage come from a UniverseStats cache when given
+    if stats is not None:
+        corr, Z = stats.corr, stats.linkage(method)
+    else:
+        corr = rets.corr().fillna(0.0)
+        dist = np.sqrt(2*(1 - corr.clip(-1,1)))
+        # convert to condensed
+        iu = np.triu_indices_from(dist, 1)
+        dvec = dist.values[iu]
+        Z = linkage(dvec, method=method)
     labels = fcluster(Z, t=k, criterion='maxclust')
     groups = {}
     cols = list(corr.columns)
@@ -27,8 +35,8 @@ def correlation_clustering(rets: pd.DataFrame, k: int, method: str = "average")
         groups.setdefault(lab, []).append(cols[i])
     return list(groups.values())
 
-def pick_medoids(rets: pd.DataFrame, clusters: List[List[str]]) -> List[str]:
-    corr = rets.corr().fillna(0.0)
+def pick_medoids(rets: pd.DataFrame, clusters: List[List[str]], stats=None) -> List[str]:
+    corr = stats.corr if stats is not None else rets.corr().fillna(0.0)
     medoids = []
     for cluster in clusters:
         sub = corr.loc[cluster, cluster]
@@ -37,24 +45,112 @@ def pick_medoids(rets: pd.DataFrame, clusters: List[List[str]]) -> List[str]:
         medoids.append(avg_corr.idxmax())
     return medoids
 
-def pca_summary(rets: pd.DataFrame, n_components: int = 5) -> pd.DataFrame:
+PCA_METHODS = ("auto", "full", "randomized", "incremental")
+
+# "auto" switches from a full to a randomised SVD above this many assets
+PCA_RANDOMIZED_MIN_ASSETS = 500
+
+
+def fit_pca(rets: pd.DataFrame, n_components: int = 5, method: str = "auto",
+            batch_size: Optional[int] = None, random_state: int = 0):
+    """
+    Fit the leading principal components of a return panel (rows with NaN dropped).
+
+    Library API for exploratory analysis: the RBSA pipeline itself does not
+    run a PCA (Approach C selects by MCMC, not principal components).
+
+    Args:
+        rets: Returns (dates x assets)
+        n_components: Number of components (capped at the number of assets)
+        method: "full" (dense SVD), "randomized" (randomised SVD of the leading
+            components only), "incremental" (IncrementalPCA over row batches,
+            updatable with partial_fit) or "auto" (randomized above
+            PCA_RANDOMIZED_MIN_ASSETS assets, else full)
+        batch_size: Rows per batch for "incremental" (default: sklearn's)
+        random_state: Seed for the randomised SVD
+
+    Returns:
+        Fitted sklearn PCA or IncrementalPCA
+    """
+    # sklearn is only needed here; keep it off the module import path
+    from sklearn.decomposition import PCA, IncrementalPCA
+
+    if method not in PCA_METHODS:
+        raise ValueError(f"Unknown PCA method '{method}' (expected one of {PCA_METHODS})")
     X = rets.dropna().values
-    pca = PCA(n_components=min(n_components, X.shape[1]))
-    pca.fit(X)
-    df = pd.DataFrame({
-        "component": [f"PC{i+1}" for i in range(pca.n_components_)],
-        "explained_variance_ratio": pca.explained_variance_ratio_
+    n_components = min(n_components, X.shape[1])
+    if method == "auto":
+        method = "randomized" if X.shape[1] > PCA_RANDOMIZED_MIN_ASSETS else "full"
+    if method == "incremental":
+        return IncrementalPCA(n_components=n_components, batch_size=batch_size).fit(X)
+    return PCA(n_components=n_components, svd_solver=method, random_state=random_state).fit(X)
+
+
+def _pca_frame(explained_variance_ratio: np.ndarray) -> pd.DataFrame:
+    return pd.DataFrame({
+        "component": [f"PC{i+1}" for i in range(len(explained_variance_ratio))],
+        "explained_variance_ratio": explained_variance_ratio
     })
-    return df
 
-def simple_regime_marks(series: pd.Series, min_len: int = 24) -> pd.Series:
-    # Placeholder: rolling median change-point heuristic
-    # Output: a series with regime ids
+
+def pca_summary(rets: pd.DataFrame, n_components: int = 5, method: str = "auto") -> pd.DataFrame:
+    """Explained variance ratio of the leading components (see fit_pca() for methods)."""
+    return _pca_frame(fit_pca(rets, n_components, method).explained_variance_ratio_)
+
+
+@dataclass
+class StreamingPCA:
+    """
+    Leading principal components updated as new months arrive.
+
+    Wraps IncrementalPCA: new rows are buffered until there are at least
+    n_components of them and then folded in with partial_fit, so the
+    decomposition is never refactorised from the full history. Library API,
+    like fit_pca(); not part of the pipeline run or its updates.
+
+    Example:
+        >>> spca = StreamingPCA(n_components=5).update(history)
+        >>> spca.update(new_month)    # buffered until a batch is full
+        >>> spca.summary()
+    """
+    n_components: int = 5
+    model: Any = None
+    columns: Optional[pd.Index] = None
+    pending: List[np.ndarray] = field(default_factory=list)
+
+    def update(self, rets: pd.DataFrame) -> "StreamingPCA":
+        from sklearn.decomposition import IncrementalPCA
+
+        if self.columns is None:
+            self.columns = rets.columns
+            self.n_components = min(self.n_components, len(rets.columns))
+            self.model = IncrementalPCA(n_components=self.n_components)
+        self.pending.append(rets[self.columns].dropna().values)
+        batch = np.vstack(self.pending)
+        if len(batch) >= self.n_components:
+            self.model.partial_fit(batch)
+            self.pending = []
+        return self
+
+    @property
+    def n_pending(self) -> int:
+        return sum(len(b) for b in self.pending)
+
+    def summary(self) -> pd.DataFrame:
+        """pca_summary() output for the rows folded in so far."""
+        if self.model is None or not hasattr(self.model, "explained_variance_ratio_"):
+            raise ValueError("StreamingPCA has not been fitted on a full batch yet")
+        return _pca_frame(self.model.explained_variance_ratio_)
+
+def regime_marks(series: pd.Series, min_len: int = 24, method: str = "pelt", penalty: Optional[float] = None) -> pd.Series:
+    """
+    Regime ids (1, 2, ...) over series.index from mean/variance change points.
+
+    See regimes.detect_regimes(); periods where the series is missing carry
+    the id of the preceding regime.
+    """
     x = series.dropna()
-    if len(x) < 2*min_len:
+    if len(x) == 0:
         return pd.Series(index=series.index, data=1)
-    # crude split at rolling median change
-    mid = len(x)//2
-    marks = pd.Series(index=series.index, data=1)
-    marks.loc[x.index[mid:]] = 2
-    return marks
+    bkps = detect_regimes(x, min_len=min_len, method=method, penalty=penalty)
+    return regime_labels(x.index, bkps).reindex(series.index).ffill().fillna(1).astype(int)
@@ -7,33 +7,77 @@ from __future__ import annotations
 import numpy as np
 import pandas as pd
 from typing import Dict, Any
-from statsmodels.tsa.ar_model import AutoReg
-from statsmodels.stats.diagnostic import acorr_ljungbox
+from scipy import stats
 
+MIN_AR1_OBS = 10
 
-def test_ar1_autocorrelation(returns: pd.Series, significance_level: float = 0.05, verbose: bool = False) -> Dict[str, Any]:
+
+def ar1_panel_stats(returns: pd.DataFrame) -> pd.DataFrame:
     """
-    Test if returns exhibit significant AR(1) autocorrelation.
+    AR(1) and lag-1 Ljung-Box statistics for a panel of return series in one pass.
+
+    For each column, fits r(t) = c + ρ r(t-1) + e(t) by conditional least squares
+    (as statsmodels AutoReg(lags=1, trend='c')) and computes the lag-1 Ljung-Box
+    statistic (as acorr_ljungbox(lags=[1])), using only lagged cross-moments.
+    Missing values are dropped per column before lagging, as Series.dropna() would.
 
     Args:
-        returns: Time series of returns
-        significance_level: p-value threshold for significance (default 0.05)
-        verbose: Print diagnostic information
+        returns: Return series (dates x funds)
 
     Returns:
-        Dict with:
-            - ar1_coef: AR(1) coefficient (ρ)
-            - ar1_pvalue: p-value for AR(1) coefficient
-            - is_significant: True if coefficient is statistically significant
-            - ljungbox_pvalue: Ljung-Box test p-value for lag 1
-            - requires_desmoothing: True if significant autocorrelation detected
-            - error: Error message if test failed
+        DataFrame indexed by fund with ar1_coef, ar1_se, ar1_pvalue,
+        ljungbox_stat, ljungbox_pvalue and n_obs. Statistics are NaN where
+        they are undefined (fewer than 3 observations or a constant series).
     """
-    # Remove NaN values
-    returns_clean = returns.dropna()
-
-    if len(returns_clean) < 10:
-        error_msg = f"Insufficient data: {len(returns_clean)} obs (need ≥10)"
+    R = returns.to_numpy(dtype=float)
+    # Compact each column's non-missing observations to the top (stable order)
+    order = np.argsort(np.isnan(R), axis=0, kind="stable")
+    R = np.take_along_axis(R, order, axis=0)
+    valid = ~np.isnan(R)
+    R = np.where(valid, R, 0.0)
+    n = valid.sum(axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # AR(1) regression moments over pairs (r(t), r(t-1))
+        y, z = R[1:], R[:-1] * valid[1:]
+        m = n - 1
+        z_bar = z.sum(axis=0) / m
+        y_bar = y.sum(axis=0) / m
+        szz = (z * z).sum(axis=0)
+        sxx = szz - m * z_bar ** 2
+        sxy = (z * y).sum(axis=0) - m * z_bar * y_bar
+        syy = (y * y).sum(axis=0) - m * y_bar ** 2
+
+        rho = sxy / sxx
+        sigma2 = (syy - rho * sxy) / m  # MLE variance, as AutoReg
+        se = np.sqrt(sigma2 / sxx)
+        pvalue = 2 * stats.norm.sf(np.abs(rho / se))
+
+        # Ljung-Box at lag 1 on full-sample demeaned series
+        d = np.where(valid, R - R.sum(axis=0) / n, 0.0)
+        r1 = (d[1:] * d[:-1]).sum(axis=0) / (d * d).sum(axis=0)
+        lb_stat = n * (n + 2) * r1 ** 2 / (n - 1)
+        lb_pvalue = stats.chi2.sf(lb_stat, 1)
+
+    undefined = (n < 3) | ~(sxx > 1e-14 * szz)
+    out = pd.DataFrame({
+        "ar1_coef": rho,
+        "ar1_se": se,
+        "ar1_pvalue": pvalue,
+        "ljungbox_stat": lb_stat,
+        "ljungbox_pvalue": lb_pvalue,
+    }, index=returns.columns)
+    out.loc[undefined] = np.nan
+    out["n_obs"] = n
+    return out
+
+
+def _ar1_test_result(row: pd.Series, significance_level: float, verbose: bool) -> Dict[str, Any]:
+    """Build the test_ar1_autocorrelation() result dict from one ar1_panel_stats() row."""
+    n_obs = int(row["n_obs"])
+
+    if n_obs < MIN_AR1_OBS:
+        error_msg = f"Insufficient data: {n_obs} obs (need ≥{MIN_AR1_OBS})"
         if verbose:
             print(f"⚠ AR(1) test skipped: {error_msg}")
         return {
@@ -42,83 +86,15 @@ def test_ar1_autocorrelation(returns: pd.Series, significance_level: float = 0.0
             "is_significant": False,
             "ljungbox_pvalue": 1.0,
             "requires_desmoothing": False,
-            "n_obs": len(returns_clean),
+            "n_obs": n_obs,
             "error": error_msg
         }
 
-    # Fit AR(1) model
-    try:
-        model = AutoReg(returns_clean, lags=1, trend='c')
-        result = model.fit()
-
-        # TODO: remove commented out section if not needed
-        # if verbose:
-        #     print(f"\nAR(1) Model Fit:")
-        #     print(f"  Parameters: {list(result.params.index)}")
-        #     print(f"  Coefficients: {result.params.values}")
-
-        # Extract AR(1) coefficient and p-value
-        # Try multiple possible parameter names
-        # ar1_coef = None
-        # ar1_pvalue = None
-        # # Check all parameter names for lag-1
-        # for param_name in result.params.index:
-        #     if 'L1' in str(param_name) or '.1' in str(param_name):
-        #         ar1_coef = result.params[param_name]
-        #         ar1_pvalue = result.pvalues[param_name]
-        #         if verbose:
-        #             print(f"  Found AR(1) coefficient in parameter: {param_name}")
-        #         break
-
-        # Get the endog variable name from the model
-        base_name = model.endog_names  # or returns_clean.name
-        lag_param_name = f"{base_name}.L1"  # Construct the exact parameter name
-
-        ar1_coef = result.params[lag_param_name]
-        ar1_pvalue = result.pvalues[lag_param_name]
-
-
-        if ar1_coef is None:
-            error_msg = f"Could not find AR(1) lag coefficient. Available: {list(result.params.index)}"
-            if verbose:
-                print(f"⚠ {error_msg}")
-            return {
-                "ar1_coef": 0.0,
-                "ar1_pvalue": 1.0,
-                "is_significant": False,
-                "ljungbox_pvalue": np.nan,
-                "requires_desmoothing": False,
-                "n_obs": len(returns_clean),
-                "error": error_msg
-            }
-
-        # Ljung-Box test for autocorrelation at lag 1
-        lb_result = acorr_ljungbox(returns_clean, lags=[1], return_df=True)
-        lb_pvalue = lb_result['lb_pvalue'].iloc[0]
-
-        # Determine if de-smoothing is needed
-        # Criteria: AR(1) coefficient is significant AND positive
-        is_significant = (ar1_pvalue < significance_level) and (ar1_coef > 0)
-
-        result_dict = {
-            "ar1_coef": float(ar1_coef),
-            "ar1_pvalue": float(ar1_pvalue),
-            "is_significant": is_significant,
-            "ljungbox_pvalue": float(lb_pvalue),
-            "requires_desmoothing": is_significant,
-            "n_obs": len(returns_clean)
-        }
-
-        # if verbose:
-        #     print(f"\nAR(1) Test Results:")
-        #     print(f"  ρ = {ar1_coef:.6f} (p={ar1_pvalue:.6f})")
-        #     print(f"  Ljung-Box p-value: {lb_pvalue:.6f}")
-        #     print(f"  Significant: {is_significant}")
-
-        return result_dict
+    ar1_coef = row["ar1_coef"]
+    ar1_pvalue = row["ar1_pvalue"]
 
-    except Exception as e:
-        error_msg = f"AR(1) model fitting failed: {str(e)}"
+    if not np.isfinite(ar1_coef) or not np.isfinite(ar1_pvalue):
+        error_msg = "AR(1) model fitting failed: lagged returns have zero variance"
         if verbose:
             print(f"⚠ {error_msg}")
         return {
@@ -127,10 +103,64 @@ def test_ar1_autocorrelation(returns: pd.Series, significance_level: float = 0.0
             "is_significant": False,
             "ljungbox_pvalue": np.nan,
             "requires_desmoothing": False,
-            "n_obs": len(returns_clean),
+            "n_obs": n_obs,
             "error": error_msg
         }
 
+    # Determine if de-smoothing is needed
+    # Criteria: AR(1) coefficient is significant AND positive
+    is_significant = bool((ar1_pvalue < significance_level) and (ar1_coef > 0))
+
+    return {
+        "ar1_coef": float(ar1_coef),
+        "ar1_pvalue": float(ar1_pvalue),
+        "is_significant": is_significant,
+        "ljungbox_pvalue": float(row["ljungbox_pvalue"]),
+        "requires_desmoothing": is_significant,
+        "n_obs": n_obs
+    }
+
+
+def test_ar1_autocorrelation(returns: pd.Series, significance_level: float = 0.05, verbose: bool = False) -> Dict[str, Any]:
+    """
+    Test if returns exhibit significant AR(1) autocorrelation.
+
+    Args:
+        returns: Time series of returns
+        significance_level: p-value threshold for significance (default 0.05)
+        verbose: Print diagnostic information
+
+    Returns:
+        Dict with:
+            - ar1_coef: AR(1) coefficient (ρ)
+            - ar1_pvalue: p-value for AR(1) coefficient
+            - is_significant: True if coefficient is statistically significant
+            - ljungbox_pvalue: Ljung-Box test p-value for lag 1
+            - requires_desmoothing: True if significant autocorrelation detected
+            - error: Error message if test failed
+    """
+    row = ar1_panel_stats(returns.to_frame()).iloc[0]
+    return _ar1_test_result(row, significance_level, verbose)
+
+
+def test_ar1_autocorrelation_panel(returns: pd.DataFrame, significance_level: float = 0.05) -> pd.DataFrame:
+    """
+    Batch version of test_ar1_autocorrelation() over a panel of funds.
+
+    Args:
+        returns: Fund returns (dates x funds)
+        significance_level: p-value threshold for significance (default 0.05)
+
+    Returns:
+        DataFrame indexed by fund with the same fields as the
+        test_ar1_autocorrelation() dict ('error' is NaN when the test ran)
+    """
+    panel = ar1_panel_stats(returns)
+    return pd.DataFrame.from_dict(
+        {fund: _ar1_test_result(row, significance_level, verbose=False) for fund, row in panel.iterrows()},
+        orient="index"
+    )
+
 
 def print_ar1_diagnostics(ar_test: Dict[str, Any], significance_level: float = 0.05) -> None:
     """
@@ -1,8 +1,8 @@
 from __future__ import annotations
-import os, sys, yaml
+import os, sys, time, copy, yaml
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List, Optional, TYPE_CHECKING
+from typing import Dict, Any, Callable, List, Optional, Tuple, TYPE_CHECKING
 
 import logging
 logger = logging.getLogger('pipeline.rbsa')
@@ -16,15 +16,24 @@ print(f"Project root: {_project_root}")
 
 if TYPE_CHECKING:
     from .checkpoints import CheckpointRunner
-from data_loader import load_fund_returns, load_portfolio, download_prices, to_monthly_returns, align_and_merge, compute_excess, compute_portfolio_returns
-from prelim import winsorize, pca_summary, correlation_clustering, pick_medoids, simple_regime_marks
-from models.approach_a import approach_A_pipeline #, stepwise_nnls
-from models.approach_b import approach_B_pipeline
-from models.approach_c import approach_C_pipeline
-from models.approach_d import approach_D_pipeline
+from data_loader import load_fund_returns, load_portfolio, download_prices, to_monthly_returns, align_mixed_frequency, compute_excess, compute_portfolio_returns
+from prelim import winsorize, winsor_bounds, correlation_clustering, pick_medoids
+from models.approach_a import approach_A_pipeline, approach_A_refit #, stepwise_nnls
+from models.approach_b import approach_B_pipeline, approach_B_refit
+from models.approach_c import approach_C_pipeline, approach_C_refit
+from models.approach_d import approach_D_pipeline, approach_D_refit
+from models.kalman_rbsa import kalman_rbsa
 from reporting import format_weights
 from rbsa_utils import Summarizer
-from desmoothing import desmooth_if_needed
+from cv import TimeSeriesFolds
+from universe import UniverseStats, stats_for
+from scoring import score_candidates
+from rolling import rolling_rbsa
+from lagged import LaggedDesign, sum_lags
+from regimes import regimes_from_config, regime_fits
+from desmoothing import desmooth_if_needed, desmooth_with_params
+from frequency import monthly_style_diagnostics
+from pipeline_state import PipelineState, config_digest, state_path
 
 def load_config(path: str) -> Dict[str, Any]:
     with open(path, "r") as f:
@@ -34,7 +43,10 @@ def load_raw_data(cfg: Dict[str, Any], project_root: str) -> Dict[str, Any]:
     """
     Load raw fund and benchmark data before preprocessing.
 
-    Returns dict with 'y', 'X_all', 'rf_series', 'tickers', 'substitution_tickers'
+    Returns dict with 'y', 'X_all', 'rf_series', 'tickers', 'substitution_tickers',
+    'benchmark' (market-anchored de-smoothing benchmark returns, or None) and,
+    for a fund reporting less often than monthly, 'aggregation' (the
+    TemporalAggregation applied to the index returns), 'X_all_monthly' and 'rf_monthly'
     """
     # Check if portfolio_csv is configured
     portfolio_csv = cfg["data"].get("portfolio_csv")
@@ -66,9 +78,16 @@ def load_raw_data(cfg: Dict[str, Any], project_root: str) -> Dict[str, Any]:
     substitution_tickers = cfg["universe"].get("substitution_only", [])
     all_tickers = tickers + substitution_tickers
 
+    # Market-anchored de-smoothing needs a benchmark, which may sit outside the universe
+    benchmark_ticker = None
+    desmooth_config = cfg.get("preprocessing", {}).get("desmooth", {})
+    if desmooth_config.get("enabled", False) and desmooth_config.get("method", "geltner") == "market_anchored":
+        benchmark_ticker = desmooth_config.get("market_anchored", {}).get("benchmark_ticker")
+    extra_tickers = [benchmark_ticker] if benchmark_ticker and benchmark_ticker not in all_tickers else []
+
     print(f"Downloading {len(tickers)} selection tickers + {len(substitution_tickers)} substitution-only tickers")
 
-    prices = download_prices(all_tickers, cfg["data"]["price_download_start"], cfg["data"]["price_download_end"])
+    prices = download_prices(all_tickers + extra_tickers, cfg["data"]["price_download_start"], cfg["data"]["price_download_end"])
     rets = to_monthly_returns(prices, cfg["data"]["frequency"]).dropna(how="all")
 
     # Separate selection vs substitution assets
@@ -76,22 +95,38 @@ def load_raw_data(cfg: Dict[str, Any], project_root: str) -> Dict[str, Any]:
     if cfg["data"]["risk_free_ticker"] in rets.columns:
         rf = rets[cfg["data"]["risk_free_ticker"]]
 
-    y, X_all, rf_series = align_and_merge(fund, rets, rf)
+    # Lower-frequency funds are matched against index returns aggregated over each reporting period
+    y, X_all, rf_series, aggregation = align_mixed_frequency(
+        fund, rets, rf,
+        fund_frequency=cfg["data"].get("fund_frequency", "auto"),
+        method=cfg["data"].get("aggregation", "compound")
+    )
+
+    benchmark = None
+    if benchmark_ticker and benchmark_ticker in X_all.columns:
+        benchmark = X_all[benchmark_ticker]
+        X_all = X_all.drop(columns=extra_tickers)
 
-    return {
+    raw = {
         "y": y,
         "X_all": X_all,
         "rf_series": rf_series,
         "tickers": tickers,
-        "substitution_tickers": substitution_tickers
+        "substitution_tickers": substitution_tickers,
+        "benchmark": benchmark
     }
+    if aggregation is not None:
+        print(f"Fund reports every {aggregation.months_per_period} months: {len(y)} periods ({aggregation.method} aggregation of monthly index returns)")
+        raw.update(aggregation=aggregation, X_all_monthly=rets[X_all.columns], rf_monthly=rf)
+    return raw
 
 
 def prepare_data(
     cfg: Dict[str, Any],
     project_root: str,
     raw_data: Dict[str, Any] = None,
-    checkpoint_runner: Optional['CheckpointRunner'] = None
+    checkpoint_runner: Optional['CheckpointRunner'] = None,
+    preprocessing: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Prepare data for RBSA analysis with preprocessing.
@@ -102,9 +137,15 @@ def prepare_data(
         raw_data: Optional pre-loaded raw data from load_raw_data()
         checkpoint_runner: Optional CheckpointRunner for human-in-the-loop interaction.
             If provided, user may be prompted at key decision points during data prep.
+        preprocessing: 'preprocessing' of an earlier prepare_data() result; its
+            de-smoothing parameters and winsorisation bounds are applied
+            instead of being re-estimated (incremental updates)
 
     Returns:
-        Dict with 'y', 'X', 'X_full', and optional 'desmooth_diagnostics'
+        Dict with 'y', 'X', 'X_full', 'preprocessing' (de-smoothing parameters
+        and winsorisation bounds), optional 'desmooth_diagnostics' and, for a
+        lower-frequency fund, 'aggregation', 'X_monthly' (monthly total
+        returns of the selection assets) and 'rf_monthly'
 
     Note:
         Backward compatible: Works identically when checkpoint_runner=None.
@@ -121,14 +162,31 @@ def prepare_data(
 
     # Test for autocorrelation and de-smooth if needed
     desmooth_config = cfg.get("preprocessing", {}).get("desmooth", {})
-    if desmooth_config.get("enabled", False):
+    if preprocessing is not None:
+        params = preprocessing["desmooth"]
+        if params is not None:
+            y = desmooth_with_params(y, params, benchmark=raw_data.get("benchmark"))
+        desmooth_diagnostics = {
+            "desmoothing_enabled": desmooth_config.get("enabled", False),
+            "desmoothing_examined": False,
+            "ar1_test": None,
+            "desmoothed": params is not None,
+            "original_returns": None,
+            "params": params
+        }
+    elif desmooth_config.get("enabled", False):
         significance_level = desmooth_config.get("significance_level", 0.05)
         verbose = desmooth_config.get("verbose", True)
+        method = desmooth_config.get("method", "geltner")
+        method_options = {k: v for k, v in desmooth_config.get(method, {}).items() if k != "benchmark_ticker"}
         y, desmooth_diagnostics = desmooth_if_needed(
             y,
             significance_level=significance_level,
             verbose=verbose,
-            checkpoint_runner=checkpoint_runner
+            checkpoint_runner=checkpoint_runner,
+            method=method,
+            benchmark=raw_data.get("benchmark"),
+            method_options=method_options
         )
     else:
         desmooth_diagnostics = {
@@ -150,9 +208,17 @@ def prepare_data(
     y_ex = y - (rf_series if rf_series is not None else 0.0)
 
     # Winsorize
-    X_ex = winsorize(X_ex, cfg["prelim"]["winsorize_pct"])
-    X_all_ex = winsorize(X_all_ex, cfg["prelim"]["winsorize_pct"])
-    y_ex = y_ex.clip(y_ex.quantile(cfg["prelim"]["winsorize_pct"]), y_ex.quantile(1-cfg["prelim"]["winsorize_pct"]))
+    # Quantiles are per column, so the selection universe reuses the full universe's bounds
+    p = cfg["prelim"]["winsorize_pct"]
+    if preprocessing is not None:
+        bounds, y_bounds = preprocessing["winsor_bounds"], preprocessing["y_bounds"]
+    else:
+        bounds = winsor_bounds(X_all_ex, p) if p else None
+        y_bounds = (y_ex.quantile(p), y_ex.quantile(1 - p)) if p else None
+    X_ex = winsorize(X_ex, p, bounds=bounds)
+    X_all_ex = winsorize(X_all_ex, p, bounds=bounds)
+    if y_bounds is not None:
+        y_ex = y_ex.clip(*y_bounds)
 
     # Drop any rows with NaN in either y or X
     y_clean = y_ex.dropna()
@@ -172,8 +238,17 @@ def prepare_data(
     print(f"After cleaning: {len(y_clean)} observations, {len(X_clean.columns)} selection assets, {len(X_all_clean.columns)} total assets")
 
     result = {"y": y_clean, "X": X_clean, "X_full": X_all_clean}
+    result["preprocessing"] = preprocessing if preprocessing is not None else {
+        "desmooth": desmooth_diagnostics.get("params"),
+        "winsor_bounds": bounds,
+        "y_bounds": y_bounds
+    }
     if desmooth_diagnostics is not None:
         result["desmooth_diagnostics"] = desmooth_diagnostics
+    if raw_data.get("aggregation") is not None:
+        result["aggregation"] = raw_data["aggregation"]
+        result["X_monthly"] = raw_data["X_all_monthly"][X_clean.columns]
+        result["rf_monthly"] = raw_data["rf_monthly"]
 
     return result
 
@@ -211,38 +286,68 @@ def finalize_results(all_candidates: List[Dict[str, Any]], cfg: Dict[str, Any])
     """
 
 
-def rbsa_run_pipeline() -> Dict[str, Any]:
+RBSA_APPROACHES = {
+    'A': 'Approach A (Stepwise NNLS)',
+    'B': 'Approach B (Elastic Net + NNLS Refit)',
+    'C': 'Approach C (PCA + NNLS)',
+    'D': 'Approach D (Clustering + Approach A)'
+}
 
-    logger.info('At beginning of rbsa_run_pipeline()')
 
-    cfg = load_config(os.path.join(_project_root, "config.yaml"))
+def run_rbsa_stages(
+    X: pd.DataFrame,
+    y: pd.Series,
+    cfg: Dict[str, Any],
+    data: Dict[str, Any],
+    stats: Optional[UniverseStats] = None,
+    precomputed: Optional[Dict[str, Dict[str, Any]]] = None,
+    approach_kwargs: Optional[Dict[str, Dict[str, Any]]] = None,
+    kalman_prior: Optional[Dict[str, Any]] = None
+) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    Run the approaches, scoring, style drift and regimes on prepared data.
 
-    data = prepare_data(cfg, _project_root)
-    X, y = data["X"], data["y"]
+    Args:
+        X, y: Prepared design and fund returns
+        cfg: Configuration dict
+        data: prepare_data() output (for the monthly diagnostics of lower-frequency funds)
+        stats: Universe statistics of (X, y), e.g. seeded with updated moments
+        precomputed: Approach results to use as they are (not rerun), keyed by approach
+        approach_kwargs: Extra keyword arguments per approach pipeline (e.g. an MCMC warm start)
+        kalman_prior: {"assets", "q"} of an earlier Kalman fit; q is reused when the
+            selected subset has the same assets
 
-    rbsa_approaches = {
-        'A': 'Approach A (Stepwise NNLS)',
-        'B': 'Approach B (Elastic Net + NNLS Refit)',
-        'C': 'Approach C (PCA + NNLS)',
-        'D': 'Approach D (Clustering + Approach A)'
-    }
+    Returns:
+        (pipeline output, approach results keyed by approach)
+    """
+    rbsa_approaches = RBSA_APPROACHES
+    precomputed = precomputed or {}
+    approach_kwargs = approach_kwargs or {}
 
     rbsa_results= {}
 
+    # Time-series CV fold statistics, computed once and shared by every approach
+    folds = TimeSeriesFolds.from_config(X, y, cfg)
+    # Correlation, Gram and linkage statistics of the universe, likewise shared
+    stats = stats_for(X, y, cfg, stats)
+
     logger.info('Begin running RBSA approaches...')
     for approach_key, approach_label in rbsa_approaches.items():
+        if approach_key in precomputed:
+            logger.info(f'{approach_label}: previous selection still valid, refitted.')
+            rbsa_results[approach_key] = precomputed[approach_key]
+            continue
         logger.info(f'beginning {approach_label}...')
         # dynamically get the function by name
         func_name = f"approach_{approach_key}_pipeline"
         pipeline_func = globals()[func_name]
         # execute the function
-        result = pipeline_func(X, y, cfg)
+        result = pipeline_func(X, y, cfg, folds=folds, stats=stats, **approach_kwargs.get(approach_key, {}))
         # store the result
         rbsa_results[approach_key] = result
         logger.info(f'{approach_label} completed.')
     logger.info('completed all RBSA approaches')
 
-
     # create score and rank for each approach
     WEIGHT_ROUNDING = 3
     DESCRIPTIVE_STATISTICS_ROUNDING = 6
@@ -265,27 +370,21 @@ def rbsa_run_pipeline() -> Dict[str, Any]:
         rbsa_summary_results_array.append(summary)
 
     # -- Scoring system to compare across approaches
-    #  add score to each summary
-    mode = cfg.get("analysis", {}).get("mode", "in_sample")
-    if mode=="in_sample":
-        scoring_metric = "r2"
-        missing_metric = -np.inf
-        logger.info(f'Scoring RBSA approaches using in-sample R² metric.')
-    else:
-        scoring_metric = "rmse"
-        missing_metric = np.inf
-        logger.info(f'Scoring RBSA approaches using out-of-sample RMSE metric.')
-    for idx, summary in enumerate(rbsa_summary_results_array):
-        score = summary.get("diagnostics", {}).get(scoring_metric, missing_metric)
-        summary["score"] = score  # Assign the computed score to the summary    
-        rbsa_summary_results_array[idx] = summary
-
-    # now sort the results based on score
-    # add rank
-    rbsa_summary_results_array_sorted = sorted(rbsa_summary_results_array, key=lambda item: item['score'], reverse=True)
-    for idx, summary in enumerate(rbsa_summary_results_array_sorted):
-        summary['rank'] = idx+1
-        rbsa_summary_results_array_sorted[idx] = summary
+    # Composite of rank-normalised metrics weighted by evaluation.weights
+    logger.info('Scoring RBSA approaches with the composite evaluation score.')
+    scores = score_candidates(X, y, list(rbsa_results.values()), cfg, folds=folds, labels=list(rbsa_results))
+    for key, summary in zip(rbsa_results, rbsa_summary_results_array):
+        summary["score"] = round(float(scores.at[key, "composite"]), DESCRIPTIVE_STATISTICS_ROUNDING)
+        summary["rank"] = int(scores.at[key, "rank"])
+        summary["score_details"] = {
+            metric: round(float(value), DESCRIPTIVE_STATISTICS_ROUNDING)
+            for metric, value in scores.loc[key].drop(["composite", "rank", "eligible", "distinct"]).items()
+        }
+        summary["eligible"] = bool(scores.at[key, "eligible"])
+        summary["distinct"] = bool(scores.at[key, "distinct"])
+
+    # sort the results by rank
+    rbsa_summary_results_array_sorted = sorted(rbsa_summary_results_array, key=lambda item: item['rank'])
 
     for summary in rbsa_summary_results_array_sorted:
         logger.info((summary['label'], summary['rank'], summary['score']))
@@ -294,10 +393,72 @@ def rbsa_run_pipeline() -> Dict[str, Any]:
     logger.info(f'Selected best approach:')
     logger.info((summary_results_best['label'], summary_results_best['rank'], summary_results_best['score']))
                 
+    # -- Style drift: rolling/expanding-window weights of the selected subset
+    style_drift = {}
+    rolling_cfg = cfg.get("rolling", {})
+    best_key = list(rbsa_results)[rbsa_summary_results_array.index(summary_results_best)]
+    best_weights = rbsa_results[best_key]["weights"]
+    if rolling_cfg.get("enable", False) and len(best_weights) > 0:
+        sum_to_one = bool(np.isclose(best_weights.sum(), 1.0))
+        # A Dimson fit drifts in its lag coefficients, on the lag-expanded design
+        drift_X, drift_y, drift_w0 = X[best_weights.index], y, best_weights.values
+        lag_weights = rbsa_results[best_key].get("lag_weights")
+        if lag_weights is not None:
+            design = LaggedDesign(drift_X, y, lag_weights.shape[1] - 1)
+            drift_X, drift_y = design.lagged_frame(best_weights.index), design.y_aligned
+            drift_w0 = lag_weights.stack().reindex(drift_X.columns).fillna(0.0).values
+        # Window lengths and half-life are configured in months; a lower-frequency fund counts reporting periods
+        months_per_period = data["aggregation"].months_per_period if data.get("aggregation") is not None else 1
+        windows = [(w, max(1, round(w / months_per_period))) for w in rolling_cfg.get("windows", [60])]
+        windows = [(w, n) for w, n in windows if n <= len(drift_y)]
+        runs = [(f"rolling_{w}m", n, False, None) for w, n in windows]
+        if rolling_cfg.get("expanding", False) and windows:
+            w, n = min(windows)
+            runs.append((f"expanding_{w}m", n, True, None))
+        if rolling_cfg.get("half_life") and windows:
+            half_life = rolling_cfg["half_life"]
+            runs.append((f"ewm_{half_life}m", min(windows)[1], False, half_life / months_per_period))
+        for label, window, expanding, half_life in runs:
+            logger.info(f'Style drift: {label} windows for {list(best_weights.index)}')
+            style_drift[label] = rolling_rbsa(
+                drift_X, drift_y, window, expanding=expanding,
+                sum_to_one=sum_to_one, w0=drift_w0, half_life=half_life
+            )
+        if rolling_cfg.get("kalman", False):
+            logger.info('Style drift: Kalman-smoothed weights')
+            q = None
+            if kalman_prior is not None and list(kalman_prior["assets"]) == list(best_weights.index):
+                q = kalman_prior["q"]
+            style_drift["kalman"] = kalman_rbsa(drift_X, drift_y, sum_to_one=sum_to_one, q=q)
+        if lag_weights is not None:
+            # Per-asset Dimson weights; the lag-level paths are kept as *_lags (smoothed_se stays lag-level)
+            for drift in style_drift.values():
+                for key in ("weights", "filtered", "smoothed"):
+                    if key in drift:
+                        drift[f"{key}_lags"], drift[key] = drift[key], sum_lags(drift[key])
+
+    # -- Regimes: change points in the selected model's residuals (or the fund return)
+    regime_series = y if cfg.get("regimes", {}).get("series", "residuals") == "fund" else rbsa_results[best_key]["residuals"]
+    regimes = regimes_from_config(regime_series, cfg)
+    logger.info(f'Detected {len(regimes["table"])} regime(s)')
+    if cfg.get("regimes", {}).get("enable", False):
+        # Per-regime refits of every approach's subset from the segment moments
+        regimes["fits"] = regime_fits(
+            X, y, {key: res.get("lag_weights", res["weights"]) for key, res in rbsa_results.items()},
+            regimes["labels"]
+        )
+
     output = {}
 
     output['analysis_results'] = {}
     output["analysis_results"]["results_final"] = summary_results_best
+    output["analysis_results"]["style_drift"] = style_drift
+    output["analysis_results"]["regimes"] = regimes
+    # Monthly replicating returns of the selected model when fitted on reporting periods
+    if data.get("aggregation") is not None and cfg["data"].get("monthly_diagnostics", True) and len(best_weights) > 0:
+        output["analysis_results"]["monthly"] = monthly_style_diagnostics(
+            data["X_monthly"], y, best_weights, data["aggregation"], rf_monthly=data.get("rf_monthly")
+        )
 
     output['pipeline_process'] = {}
     output["pipeline_process"]["results_desmoothing"] = {}
@@ -307,6 +468,260 @@ def rbsa_run_pipeline() -> Dict[str, Any]:
     output["pipeline_process"]["results_approach_D"] = rbsa_summary_results_array[3]
     output["pipeline_process"]["results_substitution"] = {}
 
+    return output, rbsa_results
+
+
+def save_pipeline_state(
+    cfg: Dict[str, Any],
+    X: pd.DataFrame,
+    y: pd.Series,
+    rbsa_results: Dict[str, Dict[str, Any]],
+    output: Dict[str, Any],
+    state: Optional[PipelineState] = None,
+    preprocessing: Optional[Dict[str, Any]] = None
+) -> PipelineState:
+    """
+    Persist the run for rbsa_update_pipeline().
+
+    `state` is an updated state to save as it is (its moments already cover
+    X, y); otherwise a new one is built from the run and `preprocessing`
+    (prepare_data()'s de-smoothing parameters and winsorisation bounds).
+    """
+    best_label = output["analysis_results"]["results_final"]["label"]
+    best_key = next(k for k, label in RBSA_APPROACHES.items() if label == best_label)
+    kalman = output["analysis_results"]["style_drift"].get("kalman")
+    kalman_prior = {"assets": list(kalman["smoothed"].columns), "q": kalman["q"]} if kalman else None
+    if state is None:
+        state = PipelineState.from_run(cfg, X, y, rbsa_results, best_key, kalman_prior, output, preprocessing)
+    else:
+        state.set_run(rbsa_results, best_key, kalman_prior, output)
+    path = state_path(cfg, _project_root)
+    try:
+        state.save(path)
+        logger.info(f'Saved pipeline state ({state.n_obs} periods) to {path}')
+    except OSError as e:
+        logger.warning(f'Could not save pipeline state to {path}: {e}')
+    return state
+
+
+def rbsa_run_pipeline() -> Dict[str, Any]:
+    """
+    Run the full pipeline on freshly loaded data.
+
+    With update.save_state (off by default) the run is also pickled to
+    update.state_path, as the starting point of rbsa_update_pipeline().
+    """
+    logger.info('At beginning of rbsa_run_pipeline()')
+
+    cfg = load_config(os.path.join(_project_root, "config.yaml"))
+
+    data = prepare_data(cfg, _project_root)
+    X, y = data["X"], data["y"]
+
+    output, rbsa_results = run_rbsa_stages(X, y, cfg, data)
+    if cfg.get("update", {}).get("save_state", False):
+        save_pipeline_state(cfg, X, y, rbsa_results, output, preprocessing=data.get("preprocessing"))
+
+    return output
+
+
+def _compare_to_rerun(
+    rbsa_results: Dict[str, Dict[str, Any]],
+    X: pd.DataFrame,
+    y: pd.Series,
+    cfg: Dict[str, Any],
+    data: Dict[str, Any]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Compare updated approach results with a full rerun on the same data.
+
+    Returns:
+        Per approach: whether the selections agree and the largest absolute
+        weight difference (over the union of both selections)
+    """
+    _, rerun_results = run_rbsa_stages(X, y, cfg, data)
+    check = {}
+    for key in RBSA_APPROACHES:
+        w_upd, w_full = rbsa_results[key]["weights"], rerun_results[key]["weights"]
+        assets = w_upd.index.union(w_full.index)
+        diff = (w_upd.reindex(assets).fillna(0.0) - w_full.reindex(assets).fillna(0.0)).abs()
+        check[key] = {
+            "same_selection": set(w_upd.index) == set(w_full.index),
+            "max_weight_diff": float(diff.max()) if len(diff) else 0.0
+        }
+    return check
+
+
+def _full_run_reason(state: Optional[PipelineState], cfg: Dict[str, Any], data: Dict[str, Any]) -> Optional[str]:
+    """Why the saved state cannot be updated incrementally (None when it can)."""
+    if state is None:
+        return "no saved state"
+    if state.config_digest != config_digest(cfg):
+        return "configuration changed"
+    if set(data["X"].columns) != set(state.X.columns):
+        return "asset universe changed"
+    if state.y.index[-1] not in data["y"].index:
+        return "saved history not in the new data"
+    new = state.new_rows(data["y"])
+    if state.n_obs + len(new) - state.full_run_at >= cfg.get("update", {}).get("reselect_months", 12):
+        return "periodic full reselection due"
+    return None
+
+
+def _refit_if_valid(
+    key: str,
+    refit: Callable[..., Dict[str, Any]],
+    previous: Optional[Dict[str, Any]],
+    X: pd.DataFrame,
+    y: pd.Series,
+    X_new: pd.DataFrame,
+    y_new: pd.Series,
+    cfg: Dict[str, Any],
+    stats: UniverseStats
+) -> Optional[Dict[str, Any]]:
+    """
+    Refit an approach's previous selection unless the new periods invalidate it.
+
+    A selection is invalid when the previous weights (lag coefficients for a
+    Dimson fit) miss a new period by more than update.residual_z times the
+    previous RMSE, or when a selected asset's refitted weight falls to
+    update.min_weight or below.
+    """
+    ucfg = cfg.get("update", {})
+    if previous is None or len(previous["weights"]) == 0:
+        return None
+    w_prev = previous["weights"]
+    lag_weights = previous.get("lag_weights")
+    if lag_weights is None:
+        fitted = X_new[w_prev.index] @ w_prev
+    else:
+        Z = LaggedDesign(X[w_prev.index], y, lag_weights.shape[1] - 1).lagged_frame(w_prev.index).loc[y_new.index]
+        fitted = Z @ lag_weights.stack().reindex(Z.columns).fillna(0.0)
+    surprise = (y_new - fitted).abs().max()
+    limit = ucfg.get("residual_z", 3.0) * previous["diagnostics"]["rmse"]
+    if surprise > limit:
+        logger.info(f'{RBSA_APPROACHES[key]}: new-period residual {surprise:.4g} > {limit:.4g}, reselecting.')
+        return None
+    result = refit(X, y, cfg, previous, stats=stats)
+    if (result["weights"] <= ucfg.get("min_weight", 1e-3)).any():
+        logger.info(f'{RBSA_APPROACHES[key]}: a selected asset lost its weight, reselecting.')
+        return None
+    return result
+
+
+def rbsa_update_pipeline(data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Month-end update of the last saved run.
+
+    Appends the periods after the saved history to the persisted moments
+    (rank-one updates) and reruns only what the new data invalidates: the
+    selections of all four approaches are kept and refitted unless a new
+    period is badly missed or an asset's weight vanishes, in which case A, B
+    and D rerun their selection and C's MCMC restarts from its saved chain
+    state with a short burn-in. Scoring, style drift (Kalman with the saved
+    noise ratio when the subset is unchanged) and regimes are recomputed.
+    With no new periods the saved output is returned. Falls back to
+    rbsa_run_pipeline() behaviour when there is no state, the configuration
+    or universe changed, or a periodic full reselection is due
+    (update.reselect_months).
+
+    New periods are prepared with the de-smoothing parameters and
+    winsorisation bounds saved by the full run, so they are transformed like
+    the history they are appended to (the data is still reloaded in full).
+
+    Substitution and LLM summaries are not part of the pipeline run and are
+    carried over by their callers.
+
+    Args:
+        data: prepare_data() output to update with (loaded when None)
+
+    Returns:
+        Pipeline output as from rbsa_run_pipeline(), with
+        pipeline_process.results_update describing what was rerun; its
+        'seconds' time the whole call, 'prepare_seconds' the data loading
+        and preparation; with update.verify, 'rerun_check' compares each
+        approach with a full rerun on the same data (see _compare_to_rerun())
+    """
+    logger.info('At beginning of rbsa_update_pipeline()')
+    start = time.perf_counter()
+
+    cfg = load_config(os.path.join(_project_root, "config.yaml"))
+    state = PipelineState.load(state_path(cfg, _project_root))
+    raw_data, saved = None, None
+    if data is None:
+        raw_data = load_raw_data(cfg, _project_root)
+        if state is not None and state.config_digest == config_digest(cfg):
+            saved = state.preprocessing
+        data = prepare_data(cfg, _project_root, raw_data=raw_data, preprocessing=saved)
+    prepare_seconds = round(time.perf_counter() - start, 3)
+
+    reason = _full_run_reason(state, cfg, data)
+    if reason is not None:
+        logger.info(f'Running the full pipeline: {reason}.')
+        if saved is not None:
+            # Prepared with the saved parameters; a full run re-estimates them
+            data = prepare_data(cfg, _project_root, raw_data=raw_data)
+        X, y = data["X"], data["y"]
+        output, rbsa_results = run_rbsa_stages(X, y, cfg, data)
+        save_pipeline_state(cfg, X, y, rbsa_results, output, preprocessing=data.get("preprocessing"))
+        output["pipeline_process"]["results_update"] = {
+            "incremental": False,
+            "reason": reason,
+            "prepare_seconds": prepare_seconds,
+            "seconds": round(time.perf_counter() - start, 3)
+        }
+        return output
+
+    new = state.new_rows(data["y"])
+    if len(new) == 0:
+        logger.info('No new periods since the saved run.')
+        output = copy.deepcopy(state.output)
+        output["pipeline_process"]["results_update"] = {
+            "incremental": True,
+            "new_periods": [],
+            "refitted": [],
+            "rerun": [],
+            "prepare_seconds": prepare_seconds,
+            "seconds": round(time.perf_counter() - start, 3)
+        }
+        return output
+
+    X_new, y_new = data["X"].loc[new, state.X.columns], data["y"].loc[new]
+    state.append(X_new, y_new)
+    X, y = state.X, state.y
+    logger.info(f'Appended {len(new)} period(s) up to {new[-1]}; {state.n_obs} periods in total.')
+
+    # Universe statistics seeded with the updated moments instead of a pass over the history
+    stats = stats_for(X, y, cfg)
+    if stats.plain_least_squares:
+        stats.gram, stats.xy, stats.yy = state.moments.xx, state.moments.xy, state.moments.yy
+
+    precomputed, approach_kwargs = {}, {}
+    refits = (("A", approach_A_refit), ("B", approach_B_refit), ("C", approach_C_refit), ("D", approach_D_refit))
+    for key, refit in refits:
+        result = _refit_if_valid(key, refit, state.results.get(key), X, y, X_new, y_new, cfg, stats)
+        if result is not None:
+            precomputed[key] = result
+    if "C" not in precomputed and state.results.get("C", {}).get("mcmc_state") is not None:
+        approach_kwargs["C"] = {"init": state.results["C"]["mcmc_state"]}
+
+    output, rbsa_results = run_rbsa_stages(
+        X, y, cfg, data, stats=stats, precomputed=precomputed,
+        approach_kwargs=approach_kwargs, kalman_prior=state.kalman
+    )
+    save_pipeline_state(cfg, X, y, rbsa_results, output, state=state)
+    output["pipeline_process"]["results_update"] = {
+        "incremental": True,
+        "new_periods": [str(d) for d in new],
+        "refitted": sorted(precomputed),
+        "rerun": [k for k in RBSA_APPROACHES if k not in precomputed],
+        "prepare_seconds": prepare_seconds,
+        "seconds": round(time.perf_counter() - start, 3)
+    }
+    if cfg.get("update", {}).get("verify", False):
+        check = _compare_to_rerun(rbsa_results, X, y, cfg, data)
+        logger.info(f'Update vs full rerun: {check}')
+        output["pipeline_process"]["results_update"]["rerun_check"] = check
     return output
 
 
@@ -314,5 +729,5 @@ def rbsa_run_pipeline() -> Dict[str, Any]:
 if __name__ == "__main__":
     root = os.path.dirname(os.path.dirname(__file__))
     os.chdir(root)
-    out = rbsa_run_pipeline()
+    out = rbsa_update_pipeline() if "--update" in sys.argv[1:] else rbsa_run_pipeline()
     print({k: (list(v["selected"]) if k != "final" else "final") for k,v in out.items() if k in ["A","B","D","final"]})
@@ -2,9 +2,7 @@ from __future__ import annotations
 import numpy as np
 import pandas as pd
 from typing import Tuple, Dict, Any, List
-from statsmodels.stats.diagnostic import acorr_ljungbox
-from statsmodels.stats.stattools import durbin_watson
-from statsmodels.regression.linear_model import yule_walker
+from scipy.signal import lfilter
 
 OPENAI_CONTEXT_MAX_CHARS = 100_000  # Approximate max chars for LLM context (e.g. gpt-4, gpt-5)
 
@@ -15,10 +13,123 @@ def rolling_origin_splits(dates: pd.DatetimeIndex, window: int, horizon: int):
         test = dates[start+window:start+window+horizon]
         yield train, test
 
-def hac_se(X: np.ndarray, resid: np.ndarray, lag: int = 6):
-    # Placeholder: return simple homoskedastic SE vector of zeros (to avoid heavy deps).
-    # In the notebook we can compute robust errors if desired.
-    return np.zeros(X.shape[1])
+def hac_se(X: np.ndarray, resid: np.ndarray, lag: int = 6, weights: np.ndarray = None,
+           sum_to_one: bool = False, active_tol: float = 1e-8) -> np.ndarray:
+    """
+    Newey-West (Bartlett kernel) HAC standard errors for the constrained RBSA regression.
+
+    Assets whose weight is at the zero bound (weight <= active_tol) are treated as
+    fixed and get SE 0; the remaining (free) coefficients are those of the
+    least-squares fit on the free assets, subject to Σw = 1 when sum_to_one. The
+    sandwich Q⁻¹ S Q⁻¹ on the free set is projected onto the sum-to-one constraint
+    with P = I - Q⁻¹1 (1'Q⁻¹1)⁻¹ 1'.
+
+    The long-run score covariance S = Γ_0 + Σ_l (1 - l/(lag+1)) (Γ_l + Γ_l') is
+    accumulated as G'G̃ + G̃'G - G'G, where G̃ is the Bartlett-filtered score
+    series, so the cost is O(T·k·lag + T·k²) rather than a loop over lags.
+
+    Args:
+        X: Regressors (T x k), or a batch of candidates (M x T x k)
+        resid: Residuals (T,), or (M x T) for a batch
+        lag: Newey-West truncation lag (config: prelim.hac_lags)
+        weights: Fitted weights (k,) or (M x k); None treats every asset as free
+        sum_to_one: Whether the fit imposed Σw = 1
+        active_tol: Weights at or below this are treated as bound-active
+
+    Returns:
+        Standard errors, shape (k,) or (M x k) for a batch
+    """
+    X = np.asarray(X, dtype=float)
+    E = np.asarray(resid, dtype=float)
+    single = X.ndim == 2
+    if single:
+        X, E = X[None], E[None]
+    m, n, k = X.shape
+    if k == 0:
+        return np.zeros((m, 0))[0] if single else np.zeros((m, 0))
+
+    if weights is None:
+        free = np.ones((m, k), dtype=bool)
+    else:
+        free = np.asarray(weights, dtype=float).reshape(m, k) > active_tol
+    Xf = X * free[:, None, :]
+
+    # Bartlett-weighted long-run covariance of the scores g(t) = x(t) e(t)
+    G = Xf * E[:, :, None]
+    bartlett = 1.0 - np.arange(lag + 1) / (lag + 1)
+    G_smooth = lfilter(bartlett, [1.0], G, axis=1)  # Σ_l w_l g(t-l)
+    cross = np.einsum("mti,mtj->mij", G, G_smooth)
+    S = cross + cross.transpose(0, 2, 1) - np.einsum("mti,mtj->mij", G, G)
+
+    # Bread on the free set (identity rows for bound-active assets keep Q invertible)
+    Q = np.einsum("mti,mtj->mij", Xf, Xf)
+    diag = np.arange(k)
+    Q[:, diag, diag] += ~free
+    Q_inv = np.linalg.pinv(Q, hermitian=True)
+    cov = Q_inv @ S @ Q_inv
+
+    if sum_to_one:
+        r = free.astype(float)[:, :, None]
+        Qr = Q_inv @ r
+        denom = (r.transpose(0, 2, 1) @ Qr)
+        P = np.eye(k) - np.where(denom > 0, Qr @ r.transpose(0, 2, 1) / np.where(denom > 0, denom, 1.0), 0.0)
+        cov = P @ cov @ P.transpose(0, 2, 1)
+
+    se = np.sqrt(np.clip(np.diagonal(cov, axis1=1, axis2=2), 0.0, None))
+    se = np.where(free, se, 0.0)
+    return se[0] if single else se
+
+def residual_autocorr_stats(resid: np.ndarray, lag: int = 6) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Durbin-Watson and Ljung-Box statistics from one set of lagged residual products.
+
+    The raw lag products c_j = Σ e(t) e(t-j), j = 0..lag, are computed once per
+    column in a single contraction; DW uses c_0, c_1 and the end points directly
+    and the demeaned ACF for Ljung-Box is recovered from the same products with
+    prefix sums. Matches statsmodels durbin_watson() and acorr_ljungbox(lags=[lag]).
+
+    Args:
+        resid: Residuals, 1-D (T,) or 2-D (T x M, one column per model)
+        lag: Ljung-Box lag (statistic is cumulative over lags 1..lag)
+
+    Returns:
+        (dw, ljungbox_stat) with shape () for 1-D input, (M,) for 2-D input.
+        Ljung-Box is NaN when T <= lag or the residuals are constant.
+    """
+    E = np.asarray(resid, dtype=float)
+    squeeze = E.ndim == 1
+    if squeeze:
+        E = E[:, None]
+    n, m = E.shape
+    if n < 2:
+        nan = np.full(m, np.nan)
+        return (nan[0], nan[0]) if squeeze else (nan, nan)
+
+    # c[j] = Σ_t e(t) e(t-j), with e(t-j) gathered from the zero-padded panel
+    padded = np.concatenate([np.zeros((lag, m)), E])
+    lagged = padded[np.arange(n)[:, None] + np.arange(lag, -1, -1)]  # (T, lag+1, M)
+    c = np.einsum("tm,tjm->jm", E, lagged)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Σ (e(t) - e(t-1))² = 2c_0 - e(0)² - e(T-1)² - 2c_1
+        dw = (2 * c[0] - E[0] ** 2 - E[-1] ** 2 - 2 * c[1]) / c[0]
+
+        # Demeaned autocovariances: Σ_{t=j}^{T-1} (e(t) - μ)(e(t-j) - μ)
+        total = E.sum(axis=0)
+        mu = total / n
+        if n <= lag:
+            lb = np.full(m, np.nan)
+            return (dw[0], lb[0]) if squeeze else (dw, lb)
+        j = np.arange(1, lag + 1)[:, None]
+        head = np.cumsum(E[:lag], axis=0)        # Σ e(0..j-1)
+        tail = np.cumsum(E[::-1][:lag], axis=0)  # Σ e(T-j..T-1)
+        gamma = c[1:] - mu * (2 * total - head - tail) + (n - j) * mu ** 2
+        gamma0 = c[0] - n * mu ** 2
+        lb = n * (n + 2) * ((gamma / gamma0) ** 2 / (n - j)).sum(axis=0)
+
+    if squeeze:
+        return dw[0], lb[0]
+    return dw, lb
 
 def model_diagnostics(y: pd.Series, yhat: pd.Series, resid: pd.Series, k: int = None) -> Dict[str, Any]:
     """
@@ -33,12 +144,14 @@ def model_diagnostics(y: pd.Series, yhat: pd.Series, resid: pd.Series, k: int =
     Returns:
         Dict with RMSE, MAE, R², Adjusted R², AIC, AICc, BIC, and diagnostic tests
     """
+    y, yhat, resid = (np.asarray(getattr(v, "values", v), dtype=float) for v in (y, yhat, resid))
+    err = y - yhat
     n = len(y)
-    rmse = float(np.sqrt(np.mean((y - yhat)**2)))
-    mae  = float(np.mean(np.abs(y - yhat)))
+    rmse = float(np.sqrt(np.mean(err**2)))
+    mae  = float(np.mean(np.abs(err)))
 
     # Calculate R²
-    ss_res = np.sum(resid**2)
+    ss_res = resid @ resid
     ss_tot = np.sum((y - y.mean())**2)
     r2 = float(1 - (ss_res / ss_tot)) if ss_tot > 0 else 0.0
 
@@ -72,8 +185,7 @@ def model_diagnostics(y: pd.Series, yhat: pd.Series, resid: pd.Series, k: int =
         bic = float(k * np.log(n) - 2 * log_likelihood)
 
     # Diagnostic tests
-    dw = float(durbin_watson(resid))
-    lb = acorr_ljungbox(resid, lags=[6], return_df=True).iloc[0,0]
+    dw, lb = residual_autocorr_stats(resid, lag=6)
 
     return {
         "rmse": rmse,
@@ -83,12 +195,80 @@ def model_diagnostics(y: pd.Series, yhat: pd.Series, resid: pd.Series, k: int =
         "aic": aic,
         "aicc": aicc,
         "bic": bic,
-        "dw": dw,
+        "dw": float(dw),
         "ljungbox_stat_lag6": float(lb),
         "n_obs": n,
         "n_params": k if k is not None else np.nan
     }
 
+DIAGNOSTIC_KEYS = ["rmse", "mae", "r2", "adj_r2", "aic", "aicc", "bic", "dw", "ljungbox_stat_lag6", "n_obs", "n_params"]
+
+def model_diagnostics_batch(y: pd.Series, Yhat, k=None) -> pd.DataFrame:
+    """
+    model_diagnostics() for many candidate fits of the same target at once.
+
+    Residuals are y - Yhat; every statistic is computed column-wise, so scoring
+    M candidates costs a handful of (T x M) array operations.
+
+    Args:
+        y: Actual values (length T)
+        Yhat: Fitted values, T x M array or DataFrame (one column per candidate)
+        k: Number of parameters, scalar or one per candidate (None = unknown)
+
+    Returns:
+        DataFrame with one row per candidate (indexed by Yhat's columns when it
+        is a DataFrame) and the model_diagnostics() keys as columns
+    """
+    index = Yhat.columns if isinstance(Yhat, pd.DataFrame) else None
+    y = np.asarray(getattr(y, "values", y), dtype=float)
+    Yhat = np.asarray(getattr(Yhat, "values", Yhat), dtype=float)
+    if Yhat.ndim == 1:
+        Yhat = Yhat[:, None]
+    n, m = Yhat.shape
+    E = y[:, None] - Yhat
+    rmse = np.sqrt(np.mean(E**2, axis=0))
+    mae = np.mean(np.abs(E), axis=0)
+
+    # Calculate R²
+    ss_res = np.einsum("tm,tm->m", E, E)
+    ss_tot = np.sum((y - y.mean())**2)
+    r2 = 1 - ss_res / ss_tot if ss_tot > 0 else np.zeros(m)
+
+    kk = np.full(m, np.nan) if k is None else np.broadcast_to(np.asarray(k, dtype=float), (m,))
+    has_k = ~np.isnan(kk)
+    dof_ok = has_k & (n > kk + 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Adjusted R² where k is provided and n > k + 1
+        adj_r2 = np.where(dof_ok, 1 - (1 - r2) * (n - 1) / (n - kk - 1), r2)
+
+        # Information criteria for normal errors, computed for the constrained
+        # regression (non-negative, sum-to-one): relative comparisons only
+        ic_ok = has_k & (kk > 0) & (ss_res > 0)
+        log_likelihood = -0.5 * n * (np.log(2 * np.pi) + np.log(ss_res / n) + 1)
+        aic = np.where(ic_ok, 2 * kk - 2 * log_likelihood, np.nan)
+        # AICc is undefined (inf) when n <= k + 1
+        aicc = np.where(ic_ok, np.where(dof_ok, aic + (2 * kk * (kk + 1)) / (n - kk - 1), np.inf), np.nan)
+        bic = np.where(ic_ok, kk * np.log(n) - 2 * log_likelihood, np.nan)
+
+    # Diagnostic tests
+    dw, lb = residual_autocorr_stats(E, lag=6)
+
+    return pd.DataFrame({
+        "rmse": rmse,
+        "mae": mae,
+        "r2": r2,
+        "adj_r2": adj_r2,
+        "aic": aic,
+        "aicc": aicc,
+        "bic": bic,
+        "dw": dw,
+        "ljungbox_stat_lag6": lb,
+        "n_obs": np.full(m, n),
+        "n_params": kk if k is None else kk.astype(int)
+    }, index=index, columns=DIAGNOSTIC_KEYS)
+
+
 def composite_score(metrics: Dict[str, float], weights: Dict[str, int]) -> float:
     # Lower-is-better for rmse/mae; assume inputs already normalized if needed
     score = 0.0
@@ -0,0 +1,366 @@
+"""
+Change-point regime detection.
+
+Segments a return (or RBSA residual) series into regimes with a change in
+mean and/or variance. The segment cost is the Gaussian negative log-likelihood
+n·log σ̂², evaluated in O(1) from cumulative sums of x and x², and the number
+of change points is controlled by a per-change penalty (default BIC-style,
+3·log T: a new mean, a new variance and the break date).
+
+- pelt: exact optimal partition with pruning (Killick et al., 2012); near
+  linear in T for series with regular changes
+- binseg: greedy binary segmentation; each split scans its segment with
+  vectorised cumulative sums, O(T log T) overall
+
+Detected breakpoints are cached per series (name and contents) and
+parameters, so repeated calls within a run do not re-segment the same fund.
+The cache is least-recently-used and bounded (SEGMENT_CACHE_SIZE entries),
+as the module lives in long-running processes.
+
+Per-regime RBSA fits take each segment's X'X, X'y, y'y and sums as
+differences of prefix sums (one cumulative pass over the data for all
+regimes and all subsets), and refit every subset per regime warm-started
+from its full-sample weights. Dimson fits are refitted on their lag-expanded
+design, over the periods with all lags available.
+"""
+from __future__ import annotations
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from cv import FoldMoments
+from optimization import nnls_simplex_gram
+from lagged import LaggedDesign, sum_lags
+
+CHANGEPOINT_METHODS = ("pelt", "binseg")
+
+# (series key, method, min_len, penalty) -> breakpoints, least recently used first
+SEGMENT_CACHE_SIZE = 256
+_SEGMENT_CACHE: "OrderedDict[Tuple, Tuple[int, ...]]" = OrderedDict()
+
+
+@dataclass
+class _SegmentCost:
+    """O(1) Gaussian mean/variance segment cost from prefix sums."""
+    s1: np.ndarray
+    s2: np.ndarray
+    var_floor: float
+
+    @classmethod
+    def from_series(cls, x: np.ndarray) -> "_SegmentCost":
+        s1 = np.concatenate([[0.0], np.cumsum(x)])
+        s2 = np.concatenate([[0.0], np.cumsum(x * x)])
+        return cls(s1, s2, var_floor=max(float(np.var(x)), 1e-300) * 1e-8)
+
+    def __call__(self, start, end):
+        """n·log σ̂² of x[start:end] (start, end scalars or arrays)."""
+        n = end - start
+        m1 = (self.s1[end] - self.s1[start]) / n
+        var = (self.s2[end] - self.s2[start]) / n - m1 * m1
+        return n * np.log(np.maximum(var, self.var_floor))
+
+
+def pelt_breakpoints(x: np.ndarray, min_len: int, penalty: float) -> List[int]:
+    """
+    Optimal change points by PELT.
+
+    Args:
+        x: Series values (T,)
+        min_len: Minimum segment length
+        penalty: Cost added per segment
+
+    Returns:
+        Interior breakpoints (start index of each new segment), ascending
+    """
+    T = len(x)
+    cost = _SegmentCost.from_series(x)
+    F = np.full(T + 1, np.inf)
+    F[0] = -penalty
+    last = np.zeros(T + 1, dtype=int)
+    R = np.array([0])
+
+    for t in range(min_len, T + 1):
+        seg = F[R] + cost(R, t)
+        j = int(np.argmin(seg))
+        F[t] = seg[j] + penalty
+        last[t] = R[j]
+        # Prune starts that can never again be optimal, then admit the next start
+        R = R[seg <= F[t]]
+        tau = t - min_len + 1
+        if tau >= min_len and np.isfinite(F[tau]):
+            R = np.append(R, tau)
+
+    bkps, t = [], T
+    while t > 0:
+        t = last[t]
+        if t > 0:
+            bkps.append(int(t))
+    return sorted(bkps)
+
+
+def binseg_breakpoints(x: np.ndarray, min_len: int, penalty: float) -> List[int]:
+    """
+    Change points by greedy binary segmentation: split the segment with the
+    largest cost reduction while it exceeds `penalty`.
+
+    Args:
+        x: Series values (T,)
+        min_len: Minimum segment length
+        penalty: Required cost reduction per split
+
+    Returns:
+        Interior breakpoints, ascending
+    """
+    cost = _SegmentCost.from_series(x)
+
+    def best_split(start: int, end: int) -> Tuple[float, int]:
+        if end - start < 2 * min_len:
+            return -np.inf, -1
+        taus = np.arange(start + min_len, end - min_len + 1)
+        gains = cost(start, end) - cost(start, taus) - cost(taus, end)
+        j = int(np.argmax(gains))
+        return float(gains[j]), int(taus[j])
+
+    segments = [(0, len(x))]
+    splits = {(0, len(x)): best_split(0, len(x))}
+    bkps = []
+    while True:
+        seg = max(segments, key=lambda s: splits[s][0])
+        gain, tau = splits[seg]
+        if gain <= penalty:
+            break
+        segments.remove(seg)
+        bkps.append(tau)
+        for new in ((seg[0], tau), (tau, seg[1])):
+            segments.append(new)
+            splits[new] = best_split(*new)
+    return sorted(bkps)
+
+
+def _series_key(series: pd.Series) -> Tuple:
+    digest = hashlib.sha1(np.ascontiguousarray(series.values, dtype=float).tobytes()).hexdigest()
+    return (series.name, len(series), str(series.index[0]), str(series.index[-1]), digest)
+
+
+def detect_regimes(
+    series: pd.Series,
+    min_len: int = 24,
+    method: str = "pelt",
+    penalty: Optional[float] = None,
+    use_cache: bool = True
+) -> List[int]:
+    """
+    Change points of a series (NaNs dropped), cached per series and parameters.
+
+    Args:
+        series: Fund returns or RBSA residuals, indexed by date
+        min_len: Minimum regime length in periods (config: regimes.min_regime_len_months)
+        method: "pelt" or "binseg"
+        penalty: Per-change penalty (default 3·log T)
+        use_cache: Reuse breakpoints from an earlier call on the same series
+
+    Returns:
+        Interior breakpoints as positions in series.dropna()
+    """
+    if method not in CHANGEPOINT_METHODS:
+        raise ValueError(f"Unknown change-point method '{method}' (expected one of {CHANGEPOINT_METHODS})")
+    x = series.dropna()
+    T = len(x)
+    if T < 2 * min_len:
+        return []
+    penalty = 3.0 * np.log(T) if penalty is None else float(penalty)
+
+    key = _series_key(x) + (method, min_len, penalty)
+    if use_cache and key in _SEGMENT_CACHE:
+        _SEGMENT_CACHE.move_to_end(key)
+        return list(_SEGMENT_CACHE[key])
+
+    find = pelt_breakpoints if method == "pelt" else binseg_breakpoints
+    bkps = find(x.values.astype(float), min_len, penalty)
+    _SEGMENT_CACHE[key] = tuple(bkps)
+    _SEGMENT_CACHE.move_to_end(key)
+    while len(_SEGMENT_CACHE) > SEGMENT_CACHE_SIZE:
+        _SEGMENT_CACHE.popitem(last=False)
+    return bkps
+
+
+def regime_labels(index: pd.Index, breakpoints: List[int]) -> pd.Series:
+    """Regime ids 1..R over `index`, a new regime starting at each breakpoint position."""
+    ids = np.ones(len(index), dtype=int)
+    for b in breakpoints:
+        ids[b:] += 1
+    return pd.Series(ids, index=index, name="regime")
+
+
+def regime_table(series: pd.Series, breakpoints: List[int]) -> pd.DataFrame:
+    """
+    One row per regime: start/end dates, length, mean and volatility of the series.
+    """
+    x = series.dropna()
+    bounds = [0] + list(breakpoints) + [len(x)]
+    rows = []
+    for r, (s, e) in enumerate(zip(bounds[:-1], bounds[1:]), start=1):
+        seg = x.iloc[s:e]
+        rows.append({
+            "regime": r,
+            "start": seg.index[0],
+            "end": seg.index[-1],
+            "n_obs": e - s,
+            "mean": float(seg.mean()),
+            "vol": float(seg.std(ddof=0))
+        })
+    return pd.DataFrame(rows).set_index("regime")
+
+
+def regimes_from_config(series: pd.Series, cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Regimes of `series` from the config `regimes` section (enable, min_regime_len_months, method, penalty).
+
+    Returns:
+        Dict with breakpoints (positions), labels (Series of regime ids) and table
+        (per-regime summary); a single regime when disabled
+    """
+    rcfg = cfg.get("regimes", {})
+    x = series.dropna()
+    bkps = []
+    if rcfg.get("enable", False):
+        bkps = detect_regimes(
+            x,
+            min_len=rcfg.get("min_regime_len_months", 24),
+            method=rcfg.get("method", "pelt"),
+            penalty=rcfg.get("penalty")
+        )
+    return {"breakpoints": bkps, "labels": regime_labels(x.index, bkps), "table": regime_table(x, bkps)}
+
+
+def segment_moments(X: np.ndarray, y: np.ndarray, breakpoints: List[int]) -> List[FoldMoments]:
+    """
+    Moments of each regime segment from prefix sums.
+
+    Args:
+        X: Regressors (T x k)
+        y: Target (T,)
+        breakpoints: Interior breakpoints (positions)
+
+    Returns:
+        One FoldMoments per segment
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    k = X.shape[1]
+    bounds = np.array([0] + list(breakpoints) + [len(y)])
+
+    def prefix(a: np.ndarray) -> np.ndarray:
+        return np.concatenate([np.zeros((1,) + a.shape[1:]), np.cumsum(a, axis=0)])[bounds]
+
+    PG = prefix(np.einsum("ti,tj->tij", X, X))
+    Pc, Psx = prefix(X * y[:, None]), prefix(X)
+    Pyy, Psy = prefix(y * y), prefix(y)
+    return [
+        FoldMoments(int(bounds[r + 1] - bounds[r]), PG[r + 1] - PG[r], Pc[r + 1] - Pc[r],
+                    float(Pyy[r + 1] - Pyy[r]), Psx[r + 1] - Psx[r], float(Psy[r + 1] - Psy[r]))
+        for r in range(len(bounds) - 1)
+    ] if k else []
+
+
+def _moment_diagnostics(m: FoldMoments, w: np.ndarray) -> Dict[str, float]:
+    sse = float(m.sse(w)[0])
+    sst = m.yy - m.sy ** 2 / m.n
+    return {"rmse": float(np.sqrt(max(sse, 0.0) / m.n)), "r2": float(1 - sse / sst) if sst > 0 else 0.0}
+
+
+def _segments(labels: pd.Series) -> Tuple[List[int], pd.Index]:
+    """Interior breakpoints (positions) and regime ids of consecutive runs of `labels`."""
+    v = labels.values
+    bkps = list(np.flatnonzero(v[1:] != v[:-1]) + 1)
+    return bkps, pd.Index(v[[0] + bkps], name="regime")
+
+
+def _refit_segments(
+    moments: List[FoldMoments],
+    idx: np.ndarray,
+    w_full: np.ndarray
+) -> Tuple[List[np.ndarray], List[Dict[str, float]]]:
+    """Per-segment simplex NNLS weights of columns `idx` and their diagnostics."""
+    sum_to_one = bool(np.isclose(w_full.sum(), 1.0))
+    W, rows = [], []
+    for m in moments:
+        sub = m.take(idx)
+        w = nnls_simplex_gram(sub.xx, sub.xy, sum_to_one=sum_to_one, w0=w_full)
+        fit, full = _moment_diagnostics(sub, w), _moment_diagnostics(sub, w_full)
+        rows.append({"n_obs": sub.n, "rmse": fit["rmse"], "r2": fit["r2"],
+                     "rmse_full": full["rmse"], "r2_full": full["r2"]})
+        W.append(w)
+    return W, rows
+
+
+def regime_fits(
+    X: pd.DataFrame,
+    y: pd.Series,
+    subsets: Dict[str, Union[pd.Series, pd.DataFrame]],
+    labels: pd.Series
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Refit each subset's simplex NNLS weights within every regime.
+
+    Segment moments are computed once over the union of the contemporaneous
+    subsets' assets; each subset slices its columns, and each regime's solve
+    is warm-started from the subset's full-sample weights. A subset whose
+    weights sum to one is refitted with the budget constraint. A Dimson subset
+    (lag coefficients, assets x lags) is refitted on its lag-expanded design
+    restricted to the labelled periods with all lags available, so its first
+    regime can be shorter.
+
+    Args:
+        X: Asset returns (T x N), aligned with y
+        y: Fund returns (T,)
+        subsets: Full-sample weights per model label (Series indexed by asset),
+            or lag coefficients (DataFrame, assets x lag) for Dimson fits
+        labels: Regime id per period (see regime_labels()), on dates of y
+
+    Returns:
+        Dict per label with:
+            - weights: DataFrame (regimes x assets); summed over lags for Dimson fits
+            - shift: DataFrame, regime weights minus full-sample weights
+            - lag_weights: DataFrame (regimes x (asset, lag)), Dimson fits only
+            - diagnostics: DataFrame per regime with n_obs, rmse and r2 of the
+              regime fit, and rmse_full / r2_full of the full-sample weights
+              in that regime
+    """
+    contemporaneous = {k: w for k, w in subsets.items() if isinstance(w, pd.Series)}
+    union = list(dict.fromkeys(a for w in contemporaneous.values() for a in w.index))
+    bkps, regime_ids = _segments(labels)
+    moments = segment_moments(X.loc[labels.index, union].values, y.loc[labels.index].values, bkps)
+
+    out = {}
+    for label, w_full in subsets.items():
+        if len(w_full) == 0:
+            continue
+        if isinstance(w_full, pd.Series):
+            idx = np.array([union.index(a) for a in w_full.index])
+            W, rows = _refit_segments(moments, idx, w_full.values)
+            weights = pd.DataFrame(W, index=regime_ids, columns=w_full.index)
+            out[label] = {
+                "weights": weights,
+                "shift": weights - w_full.values,
+                "diagnostics": pd.DataFrame(rows, index=regime_ids)
+            }
+            continue
+        assets = list(w_full.index)
+        Z = LaggedDesign(X[assets], y, w_full.shape[1] - 1).lagged_frame(assets)
+        Z = Z.loc[Z.index.intersection(labels.index)]
+        lag_bkps, lag_ids = _segments(labels.loc[Z.index])
+        b_full = w_full.stack().reindex(Z.columns).fillna(0.0)
+        W, rows = _refit_segments(segment_moments(Z.values, y.loc[Z.index].values, lag_bkps),
+                                  np.arange(Z.shape[1]), b_full.values)
+        lag_weights = pd.DataFrame(W, index=lag_ids, columns=Z.columns)
+        weights = sum_lags(lag_weights)
+        out[label] = {
+            "weights": weights,
+            "shift": weights - w_full.sum(axis=1).values,
+            "lag_weights": lag_weights,
+            "diagnostics": pd.DataFrame(rows, index=lag_ids)
+        }
+    return out
@@ -0,0 +1,337 @@
+"""
+Rolling- and expanding-window RBSA fits from incrementally updated Gram statistics.
+
+Sliding a window of `window` periods forward by one period changes its X'X
+and X'y by one added and one dropped outer product (an expanding window only
+adds). The per-step updates are accumulated with a cumulative sum, so the
+moments of every window come out of one vectorised pass (O(n_windows · k²))
+without revisiting the data.
+
+Adjacent windows almost always share the same active set, so all windows are
+first solved together on one support (a batched linear solve plus a KKT
+check). Windows where that guess is not optimal are solved by the active-set
+NNLS, walking forward and warm-starting from the predecessor; each new
+support found this way is again tried on all remaining windows at once.
+
+Exponentially weighted fits replace the hard window by a half-life: the
+moments follow G_t = λ G_{t-1} + x_t x_t' (and likewise X'y, y'y, Σy), run
+for all periods as one linear recursion along time. EWMState keeps the
+latest moments and weights so that a new month costs an O(N²) moment update
+plus a warm-started re-solve.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+from optimization import nnls_simplex_gram
+from rbsa_utils import rolling_origin_splits
+
+Moments = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def rolling_window_moments(X: np.ndarray, y: np.ndarray, window: int, expanding: bool = False) -> Moments:
+    """
+    X'X, X'y, y'y and Σy of every window of `window` consecutive periods.
+
+    Args:
+        X: Regressors (T x k)
+        y: Target (T,)
+        window: Window length in periods (1 <= window <= T); the first window
+            when expanding
+        expanding: Keep the start fixed at period 0 instead of sliding it
+
+    Returns:
+        (G, c, yy, sy) with shapes (n x k x k), (n x k), (n,), (n,),
+        n = T - window + 1; window i ends at period i + window - 1 and starts at
+        period i (rolling) or 0 (expanding)
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    T = len(y)
+    if not 1 <= window <= T:
+        raise ValueError(f"window must be in [1, {T}], got {window}")
+
+    x_in, y_in = X[window:], y[window:]
+    dG = np.einsum("ti,tj->tij", x_in, x_in)
+    dc = x_in * y_in[:, None]
+    dyy = y_in ** 2
+    dsy = y_in.copy()
+    if not expanding:
+        x_out, y_out = X[:-window], y[:-window]
+        dG -= np.einsum("ti,tj->tij", x_out, x_out)
+        dc -= x_out * y_out[:, None]
+        dyy -= y_out ** 2
+        dsy -= y_out
+
+    G = np.concatenate([(X[:window].T @ X[:window])[None], dG]).cumsum(axis=0)
+    c = np.concatenate([(X[:window].T @ y[:window])[None], dc]).cumsum(axis=0)
+    yy = np.concatenate([[y[:window] @ y[:window]], dyy]).cumsum()
+    sy = np.concatenate([[y[:window].sum()], dsy]).cumsum()
+    return G, c, yy, sy
+
+
+def ewm_decay(half_life: float) -> float:
+    """Per-period decay λ = 0.5^(1/half_life): an observation half_life periods old has half the weight."""
+    if half_life <= 0:
+        raise ValueError(f"half_life must be positive, got {half_life}")
+    return 0.5 ** (1.0 / half_life)
+
+
+def ewm_weights(n_obs: int, half_life: float) -> np.ndarray:
+    """Observation weights λ^(n_obs - 1 - t), 1 for the latest period."""
+    return ewm_decay(half_life) ** np.arange(n_obs - 1, -1, -1, dtype=float)
+
+
+def ewm_moments(X: np.ndarray, y: np.ndarray, half_life: float, min_periods: int = 1) -> Tuple[Moments, np.ndarray]:
+    """
+    Exponentially weighted X'WX, X'Wy, y'Wy and Σwy at every period from min_periods - 1.
+
+    Args:
+        X: Regressors (T x k)
+        y: Target (T,)
+        half_life: Half-life in periods
+        min_periods: First estimate uses this many periods
+
+    Returns:
+        ((G, c, yy, sy), sw) with shapes as rolling_window_moments() for
+        n = T - min_periods + 1 estimates, and sw (n,) the sum of weights
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    T, k = X.shape
+    if not 1 <= min_periods <= T:
+        raise ValueError(f"min_periods must be in [1, {T}], got {min_periods}")
+    lam = ewm_decay(half_life)
+    # One recursion s_t = λ s_{t-1} + u_t over all moment entries
+    U = np.concatenate([np.einsum("ti,tj->tij", X, X).reshape(T, k * k), X * y[:, None],
+                        (y * y)[:, None], y[:, None], np.ones((T, 1))], axis=1)
+    S = lfilter([1.0], [1.0, -lam], U, axis=0)[min_periods - 1:]
+    n = len(S)
+    G = S[:, :k * k].reshape(n, k, k)
+    return (G, S[:, k * k:k * k + k], S[:, -3], S[:, -2]), S[:, -1]
+
+
+@dataclass
+class EWMState:
+    """
+    Latest exponentially weighted moments and simplex weights, updated one period at a time.
+
+    Approach A keeps one over its selected assets when approach_A.half_life is
+    set, so incremental updates fold in new periods instead of reweighting
+    the whole history; n_obs counts the periods folded in so far.
+
+    Example:
+        >>> state = EWMState.from_data(X.values, y.values, half_life=24)
+        >>> w = state.update(x_new, y_new)    # O(k²) moment update + warm-started solve
+    """
+    decay: float
+    G: np.ndarray
+    c: np.ndarray
+    yy: float
+    sy: float
+    sw: float
+    weights: np.ndarray
+    sum_to_one: bool = True
+    n_obs: int = 0
+
+    @classmethod
+    def from_data(cls, X: np.ndarray, y: np.ndarray, half_life: float, sum_to_one: bool = True,
+                  w0: Optional[np.ndarray] = None) -> "EWMState":
+        (G, c, yy, sy), sw = ewm_moments(X, y, half_life, min_periods=len(y))
+        w = nnls_simplex_gram(G[0], c[0], sum_to_one=sum_to_one, w0=w0)
+        return cls(ewm_decay(half_life), G[0], c[0], float(yy[0]), float(sy[0]), float(sw[0]), w, sum_to_one, len(y))
+
+    def update(self, x: np.ndarray, y: float) -> np.ndarray:
+        """Fold in one period (x: (k,), y: scalar) and return the re-solved weights."""
+        x = np.asarray(x, dtype=float)
+        lam = self.decay
+        self.G = lam * self.G + np.outer(x, x)
+        self.c = lam * self.c + x * y
+        self.yy = lam * self.yy + y * y
+        self.sy = lam * self.sy + y
+        self.sw = lam * self.sw + 1.0
+        self.n_obs += 1
+        self.weights = nnls_simplex_gram(self.G, self.c, sum_to_one=self.sum_to_one, w0=self.weights)
+        return self.weights
+
+    def r2(self) -> float:
+        """Exponentially weighted R² of the current weights."""
+        w = self.weights
+        sse = self.yy - 2 * w @ self.c + w @ self.G @ w
+        sst = self.yy - self.sy ** 2 / self.sw
+        return float(1 - sse / sst) if sst > 0 else 0.0
+
+
+def _support_solve(G: np.ndarray, c: np.ndarray, support: np.ndarray, sum_to_one: bool,
+                   tol: float = 1e-10) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Batched equality-constrained solve of every window on a fixed support.
+
+    Args:
+        G, c: Window moments (n x k x k), (n x k)
+        support: Boolean mask (k,) of free assets
+        sum_to_one: Impose the budget constraint
+
+    Returns:
+        (Z, optimal): candidate weights (n x k) and a mask (n,) of windows where
+        they satisfy the simplex NNLS optimality conditions
+    """
+    n, k = c.shape
+    idx = np.flatnonzero(support)
+    m = len(idx)
+    Z = np.zeros((n, k))
+    if m == 0:
+        return Z, np.zeros(n, dtype=bool)
+    if sum_to_one:
+        A = np.ones((n, m + 1, m + 1))
+        A[:, :m, :m] = G[:, idx[:, None], idx]
+        A[:, m, m] = 0.0
+        rhs = np.concatenate([c[:, idx], np.ones((n, 1))], axis=1)
+    else:
+        A, rhs = G[:, idx[:, None], idx], c[:, idx]
+
+    det_ok = np.abs(np.linalg.det(A)) > 0
+    sol = np.zeros((n, m))
+    if det_ok.any():
+        sol[det_ok] = np.linalg.solve(A[det_ok], rhs[det_ok][..., None])[..., :m, 0]
+    Z[:, idx] = sol
+
+    grad = np.einsum("nij,nj->ni", G, Z) - c
+    lam = -grad[:, idx].mean(axis=1, keepdims=True) if sum_to_one else 0.0
+    viol = -(grad + lam)
+    viol[:, idx] = -np.inf
+    scale = np.maximum(np.einsum("nii->ni", G).max(axis=1), 1e-300)
+    optimal = det_ok & (sol > 0).all(axis=1) & (viol.max(axis=1) <= tol * scale)
+    return Z, optimal
+
+
+def rolling_simplex_weights(
+    X: np.ndarray,
+    y: np.ndarray,
+    window: int,
+    sum_to_one: bool = True,
+    w0: Optional[np.ndarray] = None,
+    moments: Optional[Moments] = None
+) -> np.ndarray:
+    """
+    Simplex NNLS weights for every window of `window` consecutive periods.
+
+    Args:
+        X: Regressors (T x k)
+        y: Target (T,)
+        window: Window length in periods (window <= T)
+        sum_to_one: Impose the budget constraint
+        w0: Optional warm start (e.g. full-sample weights); its support is tried
+            for all windows first
+        moments: Precomputed rolling_window_moments(X, y, window), e.g. expanding
+
+    Returns:
+        Weights (T - window + 1 x k); row i is fitted on periods i .. i + window - 1
+    """
+    G, c = (moments if moments is not None else rolling_window_moments(X, y, window))[:2]
+    w_first = nnls_simplex_gram(G[0], c[0], sum_to_one=sum_to_one, w0=w0)
+    support = (np.asarray(w0) > 0) if w0 is not None else (w_first > 0)
+    W, optimal = _support_solve(G, c, support, sum_to_one)
+    W[0], optimal[0] = w_first, True
+
+    # Walk forward through the windows the shared support missed: solve the first
+    # one warm-started from its predecessor, then try its support on the rest
+    pending = np.flatnonzero(~optimal)
+    while len(pending):
+        i = pending[0]
+        W[i] = nnls_simplex_gram(G[i], c[i], sum_to_one=sum_to_one, w0=W[i - 1])
+        rest = pending[1:]
+        if len(rest):
+            Z, ok = _support_solve(G[rest], c[rest], W[i] > 0, sum_to_one)
+            W[rest[ok]] = Z[ok]
+            rest = rest[~ok]
+        pending = rest
+    return W
+
+
+def weight_dispersion(W: np.ndarray) -> float:
+    """
+    RMS distance of a weight path from its mean: sqrt(mean_t ||w_t - w̄||²).
+
+    0 for a constant allocation; for simplex weights it is bounded by sqrt(2).
+    """
+    W = np.asarray(W, dtype=float)
+    if len(W) < 2:
+        return 0.0
+    return float(np.sqrt(((W - W.mean(axis=0)) ** 2).sum(axis=1).mean()))
+
+
+def rolling_weight_stability(
+    X: np.ndarray,
+    y: np.ndarray,
+    window: int,
+    sum_to_one: bool = True,
+    w0: Optional[np.ndarray] = None
+) -> float:
+    """
+    Stability of a candidate subset: weight_dispersion() of its rolling-window weights.
+
+    Lower is more stable. Returns NaN when the sample is shorter than `window`.
+    """
+    if len(y) < window:
+        return np.nan
+    return weight_dispersion(rolling_simplex_weights(X, y, window, sum_to_one=sum_to_one, w0=w0))
+
+
+def rolling_rbsa(
+    X: pd.DataFrame,
+    y: pd.Series,
+    window: int,
+    expanding: bool = False,
+    sum_to_one: bool = True,
+    w0: Optional[np.ndarray] = None,
+    half_life: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Time-varying style weights of a fixed asset subset.
+
+    Windows follow rolling_origin_splits() (horizon 0): one fit per window of
+    `window` months, labelled by its last date. With `expanding` the windows
+    keep their start at the first date and grow from `window` months. With
+    `half_life` every fit uses all periods up to its date, exponentially
+    weighted, starting once `window` months are available.
+
+    Args:
+        X: Returns of the subset's assets (T x k), indexed by date
+        y: Fund returns (T,)
+        window: Window length in periods of y (first window length when expanding)
+        expanding: Expanding instead of rolling windows
+        sum_to_one: Impose the budget constraint
+        w0: Optional warm start, e.g. the full-sample weights
+        half_life: Exponential-weighting half-life in periods of y (overrides expanding)
+
+    Returns:
+        Dict with:
+            - weights: DataFrame (window end dates x assets)
+            - r2: Series of in-window R² by window end date (weighted when half_life is set)
+            - window, expanding, half_life
+    """
+    ends = pd.Index([train[-1] for train, _ in rolling_origin_splits(y.index, window, 0)], name=y.index.name)
+    if half_life:
+        moments, n_obs = ewm_moments(X.values, y.values, half_life, min_periods=window)
+    else:
+        moments = rolling_window_moments(X.values, y.values, window, expanding=expanding)
+        n_obs = window + np.arange(len(ends)) if expanding else np.full(len(ends), window)
+    W = rolling_simplex_weights(X.values, y.values, window, sum_to_one=sum_to_one, w0=w0, moments=moments)
+
+    # In-window R² from the moments: SSE = y'y - 2w'X'y + w'X'Xw, SST = y'y - (Σy)²/n
+    G, c, yy, sy = moments
+    sse = yy - 2 * np.einsum("ni,ni->n", W, c) + np.einsum("ni,nij,nj->n", W, G, W)
+    sst = yy - sy ** 2 / n_obs
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r2 = np.where(sst > 0, 1 - sse / sst, 0.0)
+
+    return {
+        "weights": pd.DataFrame(W, index=ends, columns=X.columns),
+        "r2": pd.Series(r2, index=ends, name="r2"),
+        "window": window,
+        "expanding": expanding,
+        "half_life": half_life
+    }
@@ -0,0 +1,276 @@
+"""
+Composite scoring of candidate RBSA models.
+
+Every candidate (a weight vector over the asset universe) is scored on the
+metrics in the config `evaluation.weights` section at once:
+
+- oos_rmse / oos_mae: pooled time-series CV errors, refitting the candidate's
+  assets on each training fold (moments from TimeSeriesFolds)
+- adj_r2_or_bic: in-sample adjusted R² ("in_sample" mode) or BIC ("prediction")
+- residual_diagnostics: Ljung-Box Q(6) of the in-sample residuals
+- stability: RMS dispersion of the candidate's rolling-window weights
+  (prelim.rolling_window_months), from the incremental rolling solver
+- parsimony: number of assets held
+- economic_coherence: allocation held in meaningful positions, less the budget gap
+
+Each metric column of the candidates x metrics matrix is rank-normalised to
+[0, 1] (1 = best), so metrics on different scales can be weighted directly.
+Candidates holding more than `max_assets_per_model` assets, or whose asset set
+overlaps a better-scoring candidate by more than `jaccard_max_similarity`
+(compared as packed bitsets), are ranked after the eligible, distinct ones.
+
+When a candidate is a Dimson fit (it carries 'lag_weights'), all candidates
+are evaluated on the lag-expanded design of the assets they hold, over the
+periods with all lags available: Dimson candidates with their lag
+coefficients, the others on their lag-0 columns. Parsimony, economic
+coherence, eligibility and overlap are judged on the per-asset weights.
+"""
+from __future__ import annotations
+from typing import Dict, Any, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+from optimization import nnls_simplex_gram
+from rbsa_utils import model_diagnostics_batch
+from cv import TimeSeriesFolds, folds_for, make_splits
+from rolling import rolling_weight_stability
+from lagged import LaggedDesign
+
+# Metric -> True if higher values are better
+SCORE_METRICS = {
+    "oos_rmse": False,
+    "oos_mae": False,
+    "adj_r2_or_bic": True,  # sign-adjusted below: -BIC in prediction mode
+    "residual_diagnostics": False,
+    "stability": False,
+    "parsimony": False,
+    "economic_coherence": True,
+}
+
+# Population counts of every byte value, for bitset intersections
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+def candidate_weight_matrix(candidates: Sequence[Dict[str, Any]], columns: pd.Index) -> np.ndarray:
+    """
+    Stack candidate weight Series into a (candidates x assets) matrix over `columns`.
+
+    With (asset, lag) columns of a lag-expanded design, a candidate's
+    lag_weights fill its lag columns and plain weights fill lag 0.
+    """
+    W = np.zeros((len(candidates), len(columns)))
+    for i, c in enumerate(candidates):
+        w = c["weights"]
+        if isinstance(columns, pd.MultiIndex):
+            w = c["lag_weights"].stack() if "lag_weights" in c else pd.Series(
+                w.values, index=pd.MultiIndex.from_arrays([w.index, np.zeros(len(w), dtype=int)]))
+        W[i, columns.get_indexer(w.index)] = w.values
+    return W
+
+
+def _asset_weights(W: np.ndarray, asset_index: Optional[np.ndarray]) -> np.ndarray:
+    """Column weights summed per asset (asset_index maps each column to its asset), or W itself."""
+    if asset_index is None:
+        return W
+    out = np.zeros((len(W), int(asset_index.max()) + 1))
+    np.add.at(out.T, asset_index, W.T)
+    return out
+
+
+def candidate_metrics(
+    X: pd.DataFrame,
+    y: pd.Series,
+    W: np.ndarray,
+    folds: TimeSeriesFolds,
+    mode: str = "in_sample",
+    select_tol: float = 1e-6,
+    min_position_weight: float = 0.02,
+    stability_window: Optional[int] = 60,
+    asset_index: Optional[np.ndarray] = None
+) -> pd.DataFrame:
+    """
+    Candidates x metrics matrix (raw values, see SCORE_METRICS).
+
+    Candidates whose weights sum to one are refitted per fold with the budget
+    constraint, the others with non-negativity only. Fold predictions for all
+    candidates come from one matrix product per fold. Stability falls back to
+    the dispersion of the fold-refitted weights when the sample is shorter
+    than `stability_window` (or it is None).
+
+    Args:
+        X: Asset returns (T x N)
+        y: Fund returns (T,)
+        W: Candidate weights (m x N) over X's columns
+        folds: CV folds over X's columns
+        mode: "in_sample" (adjusted R²) or "prediction" (BIC) for adj_r2_or_bic
+        select_tol: Weight above which an asset counts as held
+        min_position_weight: Smallest weight counted as a meaningful position
+        stability_window: Rolling window (periods) for the stability metric
+        asset_index: Asset position of each column of a lag-expanded design;
+            parsimony and economic coherence then use per-asset weights
+
+    Returns:
+        DataFrame (m x SCORE_METRICS)
+    """
+    Xv, yv = X.values.astype(float), y.values.astype(float)
+    m = len(W)
+    held = W > select_tol
+    sum_to_one = np.isclose(W.sum(axis=1), 1.0)
+
+    # Fold-refitted weights (folds x m x N) and pooled out-of-sample errors
+    W_folds = np.zeros((len(folds.folds), m, W.shape[1]))
+    sq_err = np.zeros(m)
+    abs_err = np.zeros(m)
+    n_test = 0
+    for f, fold in enumerate(folds.folds):
+        tr = fold.train_moments
+        for i in range(m):
+            idx = np.flatnonzero(held[i])
+            if len(idx) == 0:
+                continue
+            W_folds[f, i, idx] = nnls_simplex_gram(
+                tr.xx[np.ix_(idx, idx)], tr.xy[idx], sum_to_one=bool(sum_to_one[i]), w0=W[i, idx]
+            )
+        resid = yv[fold.test, None] - Xv[fold.test] @ W_folds[f].T
+        sq_err += (resid ** 2).sum(axis=0)
+        abs_err += np.abs(resid).sum(axis=0)
+        n_test += len(fold.test)
+
+    diag = model_diagnostics_batch(y, Xv @ W.T, k=held.sum(axis=1))
+    fit = diag["adj_r2"].values if mode == "in_sample" else -diag["bic"].values
+
+    if stability_window and len(yv) >= stability_window:
+        dispersion = np.array([
+            rolling_weight_stability(Xv[:, h], yv, stability_window, sum_to_one=bool(s1), w0=w[h]) if h.any() else 0.0
+            for w, h, s1 in zip(W, held, sum_to_one)
+        ])
+    else:
+        dispersion = np.sqrt(((W_folds - W_folds.mean(axis=0)) ** 2).sum(axis=2).mean(axis=0))
+    A = _asset_weights(W, asset_index)
+    meaningful = np.where(A >= min_position_weight, A, 0.0).sum(axis=1)
+    coherence = meaningful - np.abs(1.0 - A.sum(axis=1))
+
+    return pd.DataFrame({
+        "oos_rmse": np.sqrt(sq_err / n_test),
+        "oos_mae": abs_err / n_test,
+        "adj_r2_or_bic": fit,
+        "residual_diagnostics": diag["ljungbox_stat_lag6"].values,
+        "stability": dispersion,
+        "parsimony": (A > select_tol).sum(axis=1).astype(float),
+        "economic_coherence": coherence,
+    }, columns=list(SCORE_METRICS))
+
+
+def rank_normalise(metrics: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rank-normalise each metric column to [0, 1], 1 = best (ties share their average rank).
+
+    Missing values score 0; a single candidate scores 1 on every metric.
+    """
+    M = metrics.to_numpy(dtype=float)
+    sign = np.array([1.0 if SCORE_METRICS.get(c, True) else -1.0 for c in metrics.columns])
+    M = np.where(np.isnan(M), -np.inf, M * sign)
+    n = len(M)
+    R = (rankdata(M, axis=0) - 1) / (n - 1) if n > 1 else np.ones_like(M)
+    R[np.isinf(M)] = 0.0
+    return pd.DataFrame(R, index=metrics.index, columns=metrics.columns)
+
+
+def jaccard_similarity(held: np.ndarray) -> np.ndarray:
+    """
+    Pairwise Jaccard similarity of candidate asset sets.
+
+    Args:
+        held: Boolean membership matrix (m x N)
+
+    Returns:
+        (m x m) matrix |A ∩ B| / |A ∪ B| (0 where both sets are empty)
+    """
+    bits = np.packbits(held, axis=1)
+    inter = _POPCOUNT[bits[:, None, :] & bits[None, :, :]].sum(axis=2)
+    size = _POPCOUNT[bits].sum(axis=1)
+    union = size[:, None] + size[None, :] - inter
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(union > 0, inter / union, 0.0)
+
+
+def dedupe_by_jaccard(held: np.ndarray, scores: np.ndarray, max_similarity: float) -> np.ndarray:
+    """
+    Greedy de-duplication: walking candidates best-first, keep one only if its
+    Jaccard similarity to every kept candidate is at most `max_similarity`.
+
+    Returns:
+        Boolean mask (m,) of kept candidates
+    """
+    sim = jaccard_similarity(held)
+    keep = np.zeros(len(scores), dtype=bool)
+    for i in np.argsort(-scores, kind="stable"):
+        keep[i] = not (sim[i, keep] > max_similarity).any()
+    return keep
+
+
+def score_candidates(
+    X: pd.DataFrame,
+    y: pd.Series,
+    candidates: Sequence[Dict[str, Any]],
+    cfg: Dict[str, Any],
+    folds: Optional[TimeSeriesFolds] = None,
+    labels: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Composite scores for candidate models using the config `evaluation` section.
+
+    Args:
+        X: Asset returns (T x N)
+        y: Fund returns (T,)
+        candidates: Dicts with a 'weights' Series indexed by asset (and 'lag_weights'
+            for Dimson fits)
+        cfg: Full config (evaluation, cv, analysis.mode and prelim.rolling_window_months are used)
+        folds: Precomputed CV folds (built from cfg['cv'] if None; not used when a
+            candidate has lag_weights)
+        labels: Row labels (default 0..m-1)
+
+    Returns:
+        DataFrame indexed by candidate, sorted best first, with the raw metrics,
+        their normalised scores ('<metric>_score'), composite (0-100),
+        n_assets, eligible, distinct and rank
+    """
+    ev = cfg.get("evaluation", {})
+    weights = pd.Series(ev.get("weights", {}), dtype=float).reindex(list(SCORE_METRICS)).fillna(0.0)
+    max_assets = ev.get("max_assets_per_model")
+    max_similarity = ev.get("jaccard_max_similarity", 1.0)
+    mode = cfg.get("analysis", {}).get("mode", "in_sample")
+
+    n_lags = max((c["lag_weights"].shape[1] - 1 for c in candidates if "lag_weights" in c), default=0)
+    asset_index = None
+    if n_lags > 0:
+        union = list(dict.fromkeys(a for c in candidates for a in c["weights"].index))
+        design = LaggedDesign(X[union], y, n_lags, make_splits(len(y) - n_lags, cfg.get("cv")))
+        X, y, folds = design.lagged_frame(union), design.y_aligned, design.folds
+        asset_index = np.repeat(np.arange(len(design.columns)), n_lags + 1)
+    else:
+        folds = folds_for(X, y, cfg, folds)
+    W = candidate_weight_matrix(candidates, X.columns)
+    held = _asset_weights(W, asset_index) > 1e-6
+
+    metrics = candidate_metrics(X, y, W, folds, mode=mode,
+                                min_position_weight=ev.get("min_position_weight", 0.02),
+                                stability_window=cfg.get("prelim", {}).get("rolling_window_months", 60),
+                                asset_index=asset_index)
+    metrics.index = labels if labels is not None else range(len(candidates))
+    scores = rank_normalise(metrics)
+    composite = 100.0 * scores.values @ weights.values / max(weights.sum(), 1e-12)
+
+    eligible = held.sum(axis=1) <= max_assets if max_assets else np.ones(len(W), dtype=bool)
+    distinct = dedupe_by_jaccard(held, np.where(eligible, composite, -np.inf), max_similarity) & eligible
+
+    out = pd.concat([metrics, scores.add_suffix("_score")], axis=1)
+    out["composite"] = composite
+    out["n_assets"] = held.sum(axis=1)
+    out["eligible"] = eligible
+    out["distinct"] = distinct
+    # Eligible, distinct candidates first, each group by composite score
+    order = np.lexsort((-composite, ~eligible, ~distinct))
+    out = out.iloc[order]
+    out["rank"] = np.arange(1, len(out) + 1)
+    return out
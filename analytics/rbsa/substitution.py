@@ -3,7 +3,7 @@ import numpy as np
 import pandas as pd
 from typing import Dict, Any, List, Tuple, Optional
 from .optimization import nnls_simplex
-from .rbsa_utils import model_diagnostics
+from .rbsa_utils import model_diagnostics_batch
 
 
 def test_weight_swap(
@@ -36,18 +36,10 @@ def test_weight_swap(
     else:
         return {"error": "Cannot swap - components not found or invalid"}
 
-    # Calculate predictions with swapped weights
+    # Predictions with swapped and original weights, diagnosed together
     assets = swapped_weights.index.tolist()
-    yhat_swapped = X[assets].values.dot(swapped_weights.values)
-    resid_swapped = y.values - yhat_swapped
-
-    # Calculate original predictions
-    yhat_original = X[assets].values.dot(original_weights.values)
-    resid_original = y.values - yhat_original
-
-    # Diagnostics
-    diag_swapped = model_diagnostics(y, pd.Series(yhat_swapped, index=y.index), pd.Series(resid_swapped, index=y.index), k=len(assets))
-    diag_original = model_diagnostics(y, pd.Series(yhat_original, index=y.index), pd.Series(resid_original, index=y.index), k=len(assets))
+    Yhat = X[assets].values.dot(np.column_stack([swapped_weights.values, original_weights.values]))
+    diag_swapped, diag_original = model_diagnostics_batch(y, Yhat, k=len(assets)).to_dict("records")
 
     # Calculate differences
     r2_diff = diag_swapped["r2"] - diag_original["r2"]
@@ -110,18 +102,15 @@ def test_substitution(
     if sum_to_one:
         new_weights = new_weights / new_weights.sum()
 
-    # Calculate predictions with substitution
-    yhat_substituted = X[new_assets].values.dot(new_weights.values)
-    resid_substituted = y.values - yhat_substituted
-
-    # Calculate original predictions
+    # Predictions with substitution and original weights, diagnosed together
     original_assets = original_weights.index.tolist()
-    yhat_original = X[original_assets].values.dot(original_weights.values)
-    resid_original = y.values - yhat_original
-
-    # Diagnostics
-    diag_substituted = model_diagnostics(y, pd.Series(yhat_substituted, index=y.index), pd.Series(resid_substituted, index=y.index), k=len(new_assets))
-    diag_original = model_diagnostics(y, pd.Series(yhat_original, index=y.index), pd.Series(resid_original, index=y.index), k=len(original_assets))
+    Yhat = np.column_stack([
+        X[new_assets].values.dot(new_weights.values),
+        X[original_assets].values.dot(original_weights.values)
+    ])
+    diag_substituted, diag_original = model_diagnostics_batch(
+        y, Yhat, k=[len(new_assets), len(original_assets)]
+    ).to_dict("records")
 
     # Calculate differences
     r2_diff = diag_substituted["r2"] - diag_original["r2"]
@@ -163,7 +152,8 @@ def test_expansion(
     substitute: str,
     components: List[str],
     original_weights: pd.Series,
-    sum_to_one: bool = True
+    sum_to_one: bool = True,
+    stats=None
 ) -> Dict[str, Any]:
     """
     Test if a composite asset should be expanded into its components.
@@ -177,6 +167,7 @@ def test_expansion(
         components: Component assets to expand into (e.g., ["IWO", "IWN"])
         original_weights: Original weight allocation
         sum_to_one: Whether weights sum to 1
+        stats: Optional UniverseStats of (X, y); the expanded model is solved from its cached Gram matrix
 
     Returns:
         Dict with expansion results and recommendation
@@ -198,21 +189,21 @@ def test_expansion(
     expanded_assets = other_assets + components
 
     # Optimize with NNLS
-    expanded_weights_values = nnls_simplex(X[expanded_assets].values, y.values, sum_to_one=sum_to_one)
+    if stats is not None:
+        expanded_weights_values = stats.fit(expanded_assets, sum_to_one=sum_to_one)
+    else:
+        expanded_weights_values = nnls_simplex(X[expanded_assets].values, y.values, sum_to_one=sum_to_one)
     expanded_weights = pd.Series(expanded_weights_values, index=expanded_assets)
 
-    # Calculate predictions with expansion
-    yhat_expanded = X[expanded_assets].values.dot(expanded_weights_values)
-    resid_expanded = y.values - yhat_expanded
-
-    # Calculate original predictions
+    # Predictions with expansion and original weights, diagnosed together
     original_assets = original_weights.index.tolist()
-    yhat_original = X[original_assets].values.dot(original_weights.values)
-    resid_original = y.values - yhat_original
-
-    # Diagnostics
-    diag_expanded = model_diagnostics(y, pd.Series(yhat_expanded, index=y.index), pd.Series(resid_expanded, index=y.index), k=len(expanded_assets))
-    diag_original = model_diagnostics(y, pd.Series(yhat_original, index=y.index), pd.Series(resid_original, index=y.index), k=len(original_assets))
+    Yhat = np.column_stack([
+        X[expanded_assets].values.dot(expanded_weights_values),
+        X[original_assets].values.dot(original_weights.values)
+    ])
+    diag_expanded, diag_original = model_diagnostics_batch(
+        y, Yhat, k=[len(expanded_assets), len(original_assets)]
+    ).to_dict("records")
 
     # Calculate differences
     r2_diff = diag_expanded["r2"] - diag_original["r2"]
@@ -253,7 +244,8 @@ def analyze_substitutions(
     X: pd.DataFrame,
     y: pd.Series,
     substitution_rules: List[Dict[str, Any]],
-    verbose: bool = True
+    verbose: bool = True,
+    stats=None
 ) -> Dict[str, Any]:
     """
     Analyze all candidates for potential substitutions.
@@ -264,6 +256,7 @@ def analyze_substitutions(
         y: Fund returns
         substitution_rules: List of substitution rules from config
         verbose: Print detailed analysis
+        stats: Optional UniverseStats of (X, y), shared across candidates and rules
 
     Returns:
         Dict with substitution analysis for each candidate
@@ -341,7 +334,7 @@ def analyze_substitutions(
                         print(f"\n✓ Found {substitute} → Testing top-down expansion to {' + '.join(components)}")
 
                     # Test expansion
-                    exp_result = test_expansion(X, y, substitute, components, candidate["weights"])
+                    exp_result = test_expansion(X, y, substitute, components, candidate["weights"], stats=stats)
                     candidate_results["substitution_tests"].append({
                         "rule": rule["name"],
                         "result": exp_result
@@ -404,8 +397,6 @@ def apply_recommended_substitutions(
     Returns:
         Updated list of candidates with substitutions applied
     """
-    from .rbsa_utils import model_diagnostics
-
     updated_candidates = []
     mode = cfg.get("analysis", {}).get("mode", "in_sample")
 
@@ -505,26 +496,33 @@ def apply_recommended_substitutions(
                     "to": components
                 })
 
-        # Recalculate diagnostics with final weights
+        # Final fitted values; diagnostics are recalculated for all candidates at once below
         if len(updated_candidate["selected"]) > 0:
             assets = updated_candidate["selected"]
             weights = updated_candidate["weights"]
             yhat = X[assets].values.dot(weights.values)
-            resid = y.values - yhat
 
             updated_candidate["yhat"] = pd.Series(yhat, index=y.index)
-            updated_candidate["residuals"] = pd.Series(resid, index=y.index)
-            updated_candidate["diagnostics"] = model_diagnostics(y, updated_candidate["yhat"], updated_candidate["residuals"], k=len(assets))
-
-            if verbose:
-                if len(updated_candidate["substitutions_applied"]) > 0:
-                    print(f"\n  Updated diagnostics:")
-                    print(f"    R²={updated_candidate['diagnostics']['r2']:.6f}")
-                    print(f"    RMSE={updated_candidate['diagnostics']['rmse']:.6f}")
-                    print(f"    Assets: {', '.join(updated_candidate['selected'])}")
+            updated_candidate["residuals"] = pd.Series(y.values - yhat, index=y.index)
 
         updated_candidates.append(updated_candidate)
 
+    # Recalculate diagnostics with final weights
+    refit = [c for c in updated_candidates if len(c["selected"]) > 0]
+    if refit:
+        diag_table = model_diagnostics_batch(
+            y,
+            np.column_stack([c["yhat"].values for c in refit]),
+            k=[len(c["selected"]) for c in refit]
+        )
+        for c, diag in zip(refit, diag_table.to_dict("records")):
+            c["diagnostics"] = diag
+
+            if verbose and len(c["substitutions_applied"]) > 0:
+                print(f"\n  Updated diagnostics ({', '.join(c['selected'])}):")
+                print(f"    R²={diag['r2']:.6f}")
+                print(f"    RMSE={diag['rmse']:.6f}")
+
     # Re-rank based on mode
     if verbose:
         print(f"\n{'='*80}")
@@ -0,0 +1,184 @@
+"""
+Per-run cache of universe statistics.
+
+UniverseStats is built once from the cleaned X and y and computes each
+statistic on first use: the Gram moments X'X, X'y and y'y, asset
+correlation, covariance and volatilities and the correlation-distance
+linkage per method. Approaches, the substitution stage and
+diagnostics read from it instead of recomputing; simplex NNLS fits on any
+asset subset are solved from slices of the cached Gram matrix.
+
+With loss="huber" (config prelim.loss) subset fits are robust: the Gram
+solution warm-starts an IRLS Huber fit (optimization.huber_simplex), an
+alternative to winsorising the tails away. With obs_weights (e.g.
+exponential weights from reweighted()) the Gram moments and fits are
+weighted; correlation, covariance and volatilities stay unweighted.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import linkage
+from optimization import nnls_simplex_gram, huber_simplex, LOSSES
+
+
+@dataclass
+class UniverseStats:
+    """
+    Lazily computed, cached statistics of the asset universe X and fund returns y.
+
+    Example:
+        >>> stats = UniverseStats(X, y)
+        >>> stats.corr                      # computed once
+        >>> w = stats.fit(["IWF", "IWD", "AGG"])
+    """
+    X: pd.DataFrame
+    y: pd.Series
+    loss: str = "squared"
+    huber_delta: float = 1.345
+    obs_weights: Optional[np.ndarray] = None
+    _cache: Dict[Tuple, Any] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.loss not in LOSSES:
+            raise ValueError(f"Unknown loss '{self.loss}' (expected one of {LOSSES})")
+
+    @cached_property
+    def values(self) -> np.ndarray:
+        return self.X.values.astype(float)
+
+    @cached_property
+    def _scaled(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows of X and y scaled by sqrt(obs_weights), so that Gram moments are weighted."""
+        y = self.y.values.astype(float)
+        if self.obs_weights is None:
+            return self.values, y
+        s = np.sqrt(np.asarray(self.obs_weights, dtype=float))
+        return self.values * s[:, None], y * s
+
+    @property
+    def plain_least_squares(self) -> bool:
+        """True when fits depend only on the unweighted Gram moments (so fold moments apply)."""
+        return self.loss == "squared" and self.obs_weights is None
+
+    @cached_property
+    def gram(self) -> np.ndarray:
+        """X'X (N x N), X'WX with obs_weights."""
+        Xs = self._scaled[0]
+        return Xs.T @ Xs
+
+    @cached_property
+    def xy(self) -> np.ndarray:
+        """X'y (N,), X'Wy with obs_weights."""
+        Xs, ys = self._scaled
+        return Xs.T @ ys
+
+    @cached_property
+    def yy(self) -> float:
+        ys = self._scaled[1]
+        return float(ys @ ys)
+
+    @cached_property
+    def corr(self) -> pd.DataFrame:
+        """Asset correlation matrix (undefined entries set to 0)."""
+        return self.X.corr().fillna(0.0)
+
+    @cached_property
+    def cov(self) -> pd.DataFrame:
+        return self.X.cov()
+
+    @cached_property
+    def vol(self) -> np.ndarray:
+        """Population standard deviation of each asset (N,)."""
+        return self.values.std(axis=0)
+
+    def linkage(self, method: str = "average") -> np.ndarray:
+        """Hierarchical clustering of the distance sqrt(2(1 - corr)), cached per method."""
+        key = ("linkage", method)
+        if key not in self._cache:
+            dist = np.sqrt(2 * (1 - self.corr.clip(-1, 1)))
+            self._cache[key] = linkage(dist.values[np.triu_indices_from(dist, 1)], method=method)
+        return self._cache[key]
+
+    def _index(self, cols: Sequence[str]) -> np.ndarray:
+        idx = self.X.columns.get_indexer(list(cols))
+        if (idx < 0).any():
+            raise KeyError(f"Columns not in universe: {[c for c, i in zip(cols, idx) if i < 0]}")
+        return idx
+
+    def gram_subset(self, cols: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(X'X, X'y) restricted to `cols`."""
+        idx = self._index(cols)
+        return self.gram[np.ix_(idx, idx)], self.xy[idx]
+
+    def fit(self, cols: Sequence[str], sum_to_one: bool = True, w0: Optional[np.ndarray] = None) -> np.ndarray:
+        """Simplex NNLS weights of y on X[cols] from the cached Gram matrix (then IRLS under the Huber loss)."""
+        G, c = self.gram_subset(cols)
+        w = nnls_simplex_gram(G, c, sum_to_one=sum_to_one, w0=w0)
+        if self.loss == "huber":
+            Xs, ys = self._scaled
+            w = huber_simplex(Xs[:, self._index(cols)], ys, sum_to_one=sum_to_one, delta=self.huber_delta, w0=w)
+        return w
+
+    def cv_rmse(self, cols: Sequence[str], splits: List[Tuple[np.ndarray, np.ndarray]], sum_to_one: bool = True) -> float:
+        """
+        Pooled out-of-sample RMSE of fit() on `cols`, refitted on each training split.
+
+        Unweighted least squares is served faster by TimeSeriesFolds.cv_rmse();
+        this is for the Huber loss or weighted fits, which need the observations.
+        With obs_weights, training rows and test errors carry the same weights.
+        """
+        idx = self._index(cols)
+        Xv, yv = self.values[:, idx], self.y.values.astype(float)
+        Xs, ys = self._scaled[0][:, idx], self._scaled[1]
+        om = self.obs_weights if self.obs_weights is not None else np.ones(len(yv))
+        sse, n = 0.0, 0.0
+        for train, test in splits:
+            Xt, yt = Xs[train], ys[train]
+            w = nnls_simplex_gram(Xt.T @ Xt, Xt.T @ yt, sum_to_one=sum_to_one)
+            if self.loss == "huber":
+                w = huber_simplex(Xt, yt, sum_to_one=sum_to_one, delta=self.huber_delta, w0=w)
+            r = yv[test] - Xv[test] @ w
+            sse, n = sse + float(om[test] @ r ** 2), n + float(om[test].sum())
+        return float(np.sqrt(sse / n))
+
+    def subset(self, cols: Sequence[str]) -> "UniverseStats":
+        """Statistics of X[cols]; already computed matrices are sliced, not recomputed."""
+        cols = list(cols)
+        idx = self._index(cols)
+        sub = UniverseStats(self.X[cols], self.y, self.loss, self.huber_delta, self.obs_weights)
+        cached = self.__dict__
+        if "values" in cached:
+            sub.values = cached["values"][:, idx]
+        if "gram" in cached:
+            sub.gram = cached["gram"][np.ix_(idx, idx)]
+        if "xy" in cached:
+            sub.xy = cached["xy"][idx]
+        if "yy" in cached:
+            sub.yy = cached["yy"]
+        if "corr" in cached:
+            sub.corr = cached["corr"].loc[cols, cols]
+        if "cov" in cached:
+            sub.cov = cached["cov"].loc[cols, cols]
+        if "vol" in cached:
+            sub.vol = cached["vol"][idx]
+        return sub
+
+    def reweighted(self, obs_weights: np.ndarray) -> "UniverseStats":
+        """Statistics with per-observation weights (Gram moments recomputed, descriptive statistics shared)."""
+        sub = UniverseStats(self.X, self.y, self.loss, self.huber_delta, np.asarray(obs_weights, dtype=float))
+        for name in ("values", "corr", "cov", "vol"):
+            if name in self.__dict__:
+                sub.__dict__[name] = self.__dict__[name]
+        sub._cache.update(self._cache)
+        return sub
+
+
+def stats_for(X: pd.DataFrame, y: pd.Series, cfg: Dict[str, Any], stats: Optional[UniverseStats] = None) -> UniverseStats:
+    """Reuse `stats` when given, else build them with the config loss (prelim.loss, prelim.huber_delta)."""
+    if stats is not None:
+        return stats
+    prelim = cfg.get("prelim", {})
+    return UniverseStats(X, y, loss=prelim.get("loss", "squared"), huber_delta=prelim.get("huber_delta", 1.345))